@@ -1,9 +1,9 @@
 import datetime
 import os
-import re
 import shutil
 import subprocess
 import sys
+import time
 import warnings
 
 from amalgkit.util import *
@@ -13,7 +13,7 @@ def get_sample_group(args, metadata):
     if args.sample_group is None:
         sample_group = metadata.df.loc[:, 'sample_group'].dropna().unique()
     else:
-        sample_group = re.findall(r"[\w]+", args.sample_group)
+        sample_group = args.sample_group.replace(',', ' ').split()
     if (len(sample_group)==0):
         txt = 'The "sample_group" column in --metadata ({}) is not filled. Please manually edit the file.\n'
         txt += '`amalgkit curate` recognizes samples with the same string in this columns to belong the same group.\n'
@@ -24,7 +24,26 @@ def get_sample_group(args, metadata):
     sample_group = '|'.join(sample_group)
     return sample_group
 
-def run_curate_r_script(args, metadata, sp, input_dir):
+def split_metadata_by_species(path_metadata):
+    # Line-based split keeps each record byte-identical to what curate.r would read with quote="".
+    sp_lines = dict()
+    with open(path_metadata) as f:
+        header = f.readline()
+        col_sp = header.rstrip('\r\n').split('\t').index('scientific_name')
+        for line in f:
+            fields = line.rstrip('\r\n').split('\t')
+            if len(fields) <= col_sp:
+                continue
+            sp = fields[col_sp].replace(" ", "_")
+            sp_lines.setdefault(sp, []).append(line)
+    return header, sp_lines
+
+def write_species_metadata(path_sp_metadata, header, lines):
+    with open(path_sp_metadata, 'w') as f:
+        f.write(header)
+        f.writelines(lines)
+
+def run_curate_r_script(args, metadata, sp, input_dir, path_curate_input_metadata):
     dist_method = args.dist_method
     mr_cut = args.mapping_rate
     correlation_threshold = args.correlation_threshold
@@ -33,7 +52,6 @@ def run_curate_r_script(args, metadata, sp, input_dir):
     dir_amalgkit_script = os.path.dirname(os.path.realpath(__file__))
     r_script_path = os.path.join(dir_amalgkit_script, 'curate.r')
     r_util_path = os.path.join(dir_amalgkit_script, 'util.r')
-    path_curate_input_metadata = os.path.join(input_dir, 'metadata.tsv')
     len_file = os.path.join(os.path.abspath(input_dir), sp, sp + '_eff_length.tsv')
     if 'cstmm' in input_dir:
         count_file = os.path.join(os.path.abspath(input_dir), sp, sp + '_cstmm_counts.tsv')
@@ -48,9 +66,9 @@ def run_curate_r_script(args, metadata, sp, input_dir):
             sys.stderr.write('Expected but undetected PATH of the effective length file: {}\n'.format(len_file))
         sys.stderr.write('Skipping {}\n'.format(sp))
         print('Skipping {}'.format(sp), flush=True)
-        return 1
+        return None
     print("Starting Rscript to obtain curated {} values.".format(args.norm), flush=True)
-    curate_r_exit_code = subprocess.call([
+    curate_r_process = subprocess.Popen([
             'Rscript',
             r_script_path,
             count_file,
@@ -72,7 +90,22 @@ def run_curate_r_script(args, metadata, sp, input_dir):
             os.path.realpath(r_util_path),
             str(args.skip_curation)
          ])
-    return curate_r_exit_code
+    return curate_r_process
+
+def collect_finished_curate_r_scripts(curate_r_processes, curate_dir):
+    for sp in list(curate_r_processes.keys()):
+        curate_r_process, path_sp_metadata = curate_r_processes[sp]
+        exit_status = curate_r_process.poll()
+        if exit_status is None:
+            continue
+        del curate_r_processes[sp]
+        os.remove(path_sp_metadata)
+        if exit_status == 0:
+            file_curate_completion_flag = os.path.join(curate_dir, sp, 'curate_completion_flag.txt')
+            with open(file_curate_completion_flag, 'w') as f:
+                f.write('amalgkit curate completed at {}\n'.format(datetime.datetime.now()))
+        else:
+            sys.stderr.write('Rscript exited with status {}: {}\n'.format(exit_status, sp))
 
 def curate_main(args):
     check_rscript()
@@ -102,6 +135,7 @@ def curate_main(args):
     if not os.path.exists(curate_dir):
         os.mkdir(curate_dir)
     print('Number of species in the selected metadata table ("exclusion"=="no"): {}'.format(len(spp)), flush=True)
+    spp_to_run = list()
     for sp in spp:
         sp = sp.replace(" ", "_")
         file_curate_completion_flag = os.path.join(curate_dir, sp, 'curate_completion_flag.txt')
@@ -112,8 +146,24 @@ def curate_main(args):
             else:
                 print('Skipping. Output file detected: {}'.format(sp), flush=True)
                 continue
+        spp_to_run.append(sp)
+    num_worker = max(1, min(args.threads, len(spp_to_run)))
+    print('Number of species to be curated with {:,} parallel Rscript(s): {:,}'.format(num_worker, len(spp_to_run)), flush=True)
+    # Each Rscript only reads its own species, so it receives a per-species slice of the input metadata.
+    metadata_header, sp_metadata_lines = split_metadata_by_species(os.path.join(input_dir, 'metadata.tsv'))
+    curate_r_processes = dict()
+    for sp in spp_to_run:
+        while len(curate_r_processes) >= num_worker:
+            time.sleep(1)
+            collect_finished_curate_r_scripts(curate_r_processes, curate_dir)
         print('Starting: {}'.format(sp), flush=True)
-        exit_status = run_curate_r_script(args, metadata, sp, input_dir)
-        if exit_status == 0:
-            with open(file_curate_completion_flag, 'w') as f:
-                f.write('amalgkit curate completed at {}\n'.format(datetime.datetime.now()))
+        path_sp_metadata = os.path.realpath(os.path.join(curate_dir, 'tmp.' + sp + '.metadata.tsv'))
+        write_species_metadata(path_sp_metadata, metadata_header, sp_metadata_lines.get(sp, []))
+        curate_r_process = run_curate_r_script(args, metadata, sp, input_dir, path_sp_metadata)
+        if curate_r_process is None:
+            os.remove(path_sp_metadata)
+        else:
+            curate_r_processes[sp] = (curate_r_process, path_sp_metadata)
+    for curate_r_process, _ in curate_r_processes.values():
+        curate_r_process.wait()
+    collect_finished_curate_r_scripts(curate_r_processes, curate_dir)
@@ -3,19 +3,10 @@ from amalgkit.util import *
 import glob
 
 
-def list_duplicates(seq):
-    seen = set()
-    seen_add = seen.add
-    # adds all elements it doesn't know yet to seen and all other to seen_twice
-    seen_twice = set(x for x in seq if x in seen or seen_add(x))
-    # turn the set into a list (as requested)
-    return list(seen_twice)
-
-
 def parse_metadata(args, metadata):
     print("Checking essential entries from metadata file.")
     species = metadata.df.loc[:, 'scientific_name']
-    uni_species = np.unique(species)
+    uni_species = np.unique(species.values)
     if len(uni_species):
         print(len(uni_species), " species detected:")
         print(uni_species)
@@ -24,16 +15,17 @@ def parse_metadata(args, metadata):
         raise ValueError(txt.format(len(uni_species), args.metadata))
 
     sra_ids = metadata.df.loc[:, 'run']
+    uni_sra_ids, sra_id_counts = np.unique(sra_ids.values, return_counts=True)
     if len(sra_ids):
-        print(len(np.unique(sra_ids)), " SRA runs detected:")
-        print(np.unique(sra_ids))
+        print(len(uni_sra_ids), " SRA runs detected:")
+        print(uni_sra_ids)
         # check for duplicate runs
-        if len(sra_ids) > len(np.unique(sra_ids)):
+        if (sra_id_counts > 1).any():
             raise ValueError("Duplicate SRA IDs detected, where IDs should be unique. Please check these entries: ",
-                             list_duplicates(sra_ids))
+                             uni_sra_ids[sra_id_counts > 1].tolist())
     else:
         txt = "{} SRA runs detected. Please check if --metadata ({}) has a 'run' column."
-        raise ValueError(txt.format(len(np.unique(sra_ids)), args.metadata))
+        raise ValueError(txt.format(len(uni_sra_ids), args.metadata))
     return uni_species, sra_ids
 
 
@@ -76,11 +68,10 @@ def check_getfastq_outputs(args, sra_ids, metadata, output_dir):
         data_unavailable = metadata.df['run'].tolist()
 
     if data_unavailable:
-        print("writing SRA IDs without getfastq output to: ", os.path.join(output_dir, "SRA_IDs_without_fastq.txt"))
-        file = open(os.path.join(output_dir, "SRA_IDs_without_fastq.txt"), "w")
-        for sra_id in data_unavailable:
-            file.write(sra_id + "\n")
-        file.close()
+        file_without_fastq = os.path.join(output_dir, "SRA_IDs_without_fastq.txt")
+        print("writing SRA IDs without getfastq output to: ", file_without_fastq)
+        with open(file_without_fastq, "w") as f:
+            f.write("\n".join(data_unavailable) + "\n")
     else:
         txt = "The getfastq output files for all SRA IDs in --metadata ({}) were found."
         print(txt.format(args.metadata))
@@ -97,13 +88,15 @@ def check_quant_index(args, uni_species, output_dir):
     index_unavailable = []
     index_available = []
     if os.path.exists(index_dir_path):
+        with os.scandir(index_dir_path) as entries:
+            index_dir_files = [e.name for e in entries]
         for species in uni_species:
             sci_name = species.replace(" ", "_")
             sci_name = sci_name.replace(".", "")
             index_path = os.path.join(index_dir_path, sci_name + "*")
             print("\n")
             print("Looking for index file {} for species {}".format(index_path, species))
-            index_files = glob.glob(index_path)
+            index_files = [os.path.join(index_dir_path, f) for f in index_dir_files if f.startswith(sci_name)]
             if not index_files:
                 print("could not find anything in", index_path)
                 sci_name = species.split(" ")
@@ -114,7 +107,7 @@ def check_quant_index(args, uni_species, output_dir):
                     print("Ignoring subspecies.")
                     index_path = os.path.join(index_dir_path, sci_name + "*")
                     print("Looking for {}".format(index_path))
-                    index_files = glob.glob(index_path)
+                    index_files = [os.path.join(index_dir_path, f) for f in index_dir_files if f.startswith(sci_name)]
                     if index_files:
                         print("Found ", index_files, "!")
                         index_available.append(species)
@@ -134,11 +127,10 @@ def check_quant_index(args, uni_species, output_dir):
                       ". You may have to resolve ambiguity")
 
         if index_unavailable:
-            print("writing species without index to: ", os.path.join(output_dir, "species_without_index.txt"))
-            file = open(os.path.join(output_dir, "species_without_index.txt"), "w")
-            for species in index_unavailable:
-                file.write(species + "\n")
-            file.close()
+            file_without_index = os.path.join(output_dir, "species_without_index.txt")
+            print("writing species without index to: ", file_without_index)
+            with open(file_without_index, "w") as f:
+                f.write("\n".join(index_unavailable) + "\n")
         else:
             print("index found for all species in --metadata ({})".format(args.metadata))
     else:
@@ -160,21 +152,25 @@ def check_quant_output(args, sra_ids, output_dir):
             print("\n")
             print("Looking for {}".format(sra_id))
             sra_path = os.path.join(quant_path, sra_id)
-            if os.path.exists(sra_path):
+            if os.path.isdir(sra_path):
                 print("Found output folder ", sra_path, " for ", sra_id)
                 print("Checking for output files.")
-                abundance_file = os.path.join(sra_path, sra_id + "_abundance.tsv")
-                run_info_file = os.path.join(sra_path, sra_id + "_run_info.json")
-
-                if os.path.exists(abundance_file) and os.path.exists(run_info_file):
+                abundance_name = sra_id + "_abundance.tsv"
+                run_info_name = sra_id + "_run_info.json"
+                with os.scandir(sra_path) as entries:
+                    sra_files = set(e.name for e in entries)
+                is_abundance = abundance_name in sra_files
+                is_run_info = run_info_name in sra_files
+
+                if is_abundance and is_run_info:
                     print("All quant output files present for", sra_id, "!")
                     data_available.append(sra_id)
                     continue
-                elif not os.path.exists(abundance_file):
-                    print(abundance_file, " is missing! Please check if quant ran correctly")
+                elif not is_abundance:
+                    print(os.path.join(sra_path, abundance_name), " is missing! Please check if quant ran correctly")
                     warned = True
-                elif not os.path.exists(run_info_file):
-                    print(run_info_file, " is missing! Please check if quant ran correctly")
+                elif not is_run_info:
+                    print(os.path.join(sra_path, run_info_name), " is missing! Please check if quant ran correctly")
                     warned = True
 
                 if warned:
@@ -187,11 +183,10 @@ def check_quant_output(args, sra_ids, output_dir):
         print("Could not find quant output folder ", quant_path, ". Have you run quant yet?")
 
     if data_unavailable:
-        print("writing SRA IDs without quant output to: ", os.path.join(output_dir, "SRA_IDs_without_quant.txt"))
-        file = open(os.path.join(output_dir, "SRA_IDs_without_quant.txt"), "w")
-        for sra_id in data_unavailable:
-            file.write(sra_id + "\n")
-        file.close()
+        file_without_quant = os.path.join(output_dir, "SRA_IDs_without_quant.txt")
+        print("writing SRA IDs without quant output to: ", file_without_quant)
+        with open(file_without_quant, "w") as f:
+            f.write("\n".join(data_unavailable) + "\n")
     else:
         print("Quant outputs found for all SRA IDs in --metadata ({})".format(args.metadata))
 
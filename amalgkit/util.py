@@ -6,12 +6,21 @@ import datetime
 
 import glob
 import inspect
+import itertools
 import os
 import re
 import subprocess
 import sys
 import warnings
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+p_pseudoaligned_regex = re.compile(rb'"p_pseudoaligned"\s*:\s*([0-9.eE+\-]+)')
+
 def strtobool(val):
     val = val.lower()
     if val in ("y", "yes", "t", "true", "on", "1"):
@@ -57,6 +66,13 @@ class Metadata:
             self.df = self.df.loc[:, cols]
         self.df = self.df.reset_index(drop=True)
 
+    def get_run_positions(self):
+        # {run: row positions}, built once per DataFrame and rebuilt whenever self.df is replaced
+        if getattr(self, '_run_positions_df', None) is not self.df:
+            self._run_positions = self.df.groupby('run', sort=False).indices
+            self._run_positions_df = self.df
+        return self._run_positions
+
     def from_DataFrame(df):
         metadata = Metadata()
         metadata.df = df
@@ -386,7 +402,9 @@ def load_metadata(args, dir_subcommand='metadata'):
     else:
         real_path = os.path.realpath(args.metadata)
     print('{}: Loading metadata from: {}'.format(datetime.datetime.now(), real_path), flush=True)
-    df = pandas.read_csv(real_path, sep='\t', header=0, low_memory=False)
+    # Identifier columns are always strings, so their types are given instead of inferred.
+    str_dtypes = {col: str for col in ['scientific_name', ] + Metadata.id_cols}
+    df = pandas.read_csv(real_path, sep='\t', header=0, engine='c', dtype=str_dtypes, low_memory=False)
     metadata = Metadata.from_DataFrame(df)
     if 'batch' not in dir(args):
         return metadata
@@ -399,12 +417,13 @@ def load_metadata(args, dir_subcommand='metadata'):
     if mod.__name__ == 'amalgkit.curate':
         print('Entering --batch mode for amalgkit curate. processing 1 species', flush=True)
         txt = 'This is {:,}th job. In total, {:,} jobs will be necessary for this metadata table.'
-        spp = metadata.df.loc[:, 'scientific_name'].drop_duplicates().sort_values().values
-        print(txt.format(args.batch, len(spp)), flush=True)
-        sp = spp[args.batch - 1]
+        # dropna=False keeps rows without scientific_name as their own last group, as drop_duplicates() did,
+        # so the --batch numbering does not shift
+        sp_groups = metadata.df.groupby('scientific_name', sort=True, dropna=False)
+        print(txt.format(args.batch, sp_groups.ngroups), flush=True)
+        sp, sp_df = next(itertools.islice(sp_groups, args.batch - 1, None))
         print('Processing species: {}'.format(sp), flush=True)
-        is_sp = (metadata.df['scientific_name'] == sp)
-        metadata.df = metadata.df.loc[is_sp,:].reset_index(drop=True)
+        metadata.df = sp_df.reset_index(drop=True)
         return metadata
     else:
         print('--batch is specified. Processing one SRA per job.', flush=True)
@@ -426,13 +445,14 @@ def load_metadata(args, dir_subcommand='metadata'):
 def get_sra_stat(sra_id, metadata, num_bp_per_sra=None):
     sra_stat = dict()
     sra_stat['sra_id'] = sra_id
-    is_sra = (metadata.df.loc[:,'run']==sra_id)
-    assert is_sra.sum()==1, 'There are multiple metadata rows with the same SRA ID: '+sra_id
-    sra_stat['layout'] = metadata.df.loc[is_sra,'lib_layout'].values[0]
-    sra_stat['total_spot'] = int(metadata.df.loc[is_sra,'total_spots'].values[0])
-    original_spot_len = metadata.df.loc[is_sra,'spot_length'].values[0]
+    sra_positions = metadata.get_run_positions().get(sra_id, [])
+    assert len(sra_positions)==1, 'There are multiple metadata rows with the same SRA ID: '+sra_id
+    sra_row = metadata.df.iloc[sra_positions[0]][['lib_layout','total_spots','spot_length','total_bases']]
+    sra_stat['layout'] = sra_row['lib_layout']
+    sra_stat['total_spot'] = int(sra_row['total_spots'])
+    original_spot_len = sra_row['spot_length']
     if (numpy.isnan(original_spot_len) | (original_spot_len==0)):
-        inferred_spot_len = int(metadata.df.loc[is_sra,'total_bases'].values[0]) / int(sra_stat['total_spot'])
+        inferred_spot_len = int(sra_row['total_bases']) / int(sra_stat['total_spot'])
         sra_stat['spot_length'] = int(inferred_spot_len)
         txt = 'spot_length cannot be obtained directly from metadata. Using total_bases/total_spots instead: {:,}'
         print(txt.format(sra_stat['spot_length']))
@@ -512,24 +532,34 @@ def write_updated_metadata(metadata, outpath, args):
     quant_dir = os.path.join(args.out_dir, 'quant')
     metadata = get_mapping_rate(metadata, quant_dir)
     print('Writing curate metadata containing mapping rate: {}'.format(outpath))
-    metadata.df.to_csv(outpath, sep='\t', index=False)
+    metadata.df.to_csv(outpath, sep='\t', index=False, chunksize=10000)
 
 def get_mapping_rate(metadata, quant_dir):
     if os.path.exists(quant_dir):
         print('quant directory found: {}'.format(quant_dir))
-        metadata.df.loc[:, 'mapping_rate'] = numpy.nan
-        sra_ids = metadata.df.loc[:, 'run'].values
-        sra_dirs = [d for d in os.listdir(quant_dir) if d in sra_ids]
+        sra_ids = set(metadata.df.loc[:, 'run'].dropna().values)
+        if len(sra_ids) == 0:
+            print('No SRA run ID found in metadata. Skipping the quant directory scan.')
+            metadata.df.loc[:, 'mapping_rate'] = numpy.nan
+            return metadata
+        with os.scandir(quant_dir) as entries:
+            sra_dirs = [e.name for e in entries if (e.name in sra_ids) and e.is_dir()]
         print('Number of quant sub-directories that matched to metadata: {:,}'.format(len(sra_dirs)))
+        mapping_rates = dict()
         for sra_id in sra_dirs:
             run_info_path = os.path.join(quant_dir, sra_id, sra_id + '_run_info.json')
-            if not os.path.exists(run_info_path):
+            if not os.path.isfile(run_info_path):
                 sys.stderr.write('run_info.json not found. Skipping {}.\n'.format(sra_id))
                 continue
-            is_sra = (metadata.df.loc[:, 'run'] == sra_id)
-            with open(run_info_path) as f:
-                run_info = json.load(f)
-            metadata.df.loc[is_sra, 'mapping_rate'] = run_info['p_pseudoaligned']
+            with open(run_info_path, 'rb') as f:
+                run_info = f.read()
+            # Only p_pseudoaligned is needed, so the full JSON is parsed only if the pattern is missed.
+            match = p_pseudoaligned_regex.search(run_info)
+            if match is None:
+                mapping_rates[sra_id] = json_loads(run_info)['p_pseudoaligned']
+            else:
+                mapping_rates[sra_id] = float(match.group(1))
+        metadata.df.loc[:, 'mapping_rate'] = metadata.df.loc[:, 'run'].map(mapping_rates).astype(float)
     else:
         txt = 'quant directory not found. Mapping rate cutoff will not be applied: {}\n'
         sys.stderr.write(txt.format(quant_dir))
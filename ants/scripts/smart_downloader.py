@@ -11,30 +11,33 @@ This script improves upon the default amalgkit getfastq process by:
 """
 
 import os
+import io
 import sys
 import argparse
 import subprocess
 import time
 import concurrent.futures
-from queue import Queue
+import functools
+from queue import SimpleQueue
+import threading
 from threading import Lock
-try:
-    import pyarrow
-except ImportError:
-    # Install pyarrow for future pandas compatibility
-    try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "pyarrow"], 
-                             stdout=subprocess.DEVNULL, 
-                             stderr=subprocess.DEVNULL)
-        import pyarrow
-    except:
-        pass  # Silently continue if pyarrow installation fails
-import pandas as pd
 import logging
+import logging.handlers
+import atexit
+import contextlib
 from datetime import datetime
 import shutil
+import errno
 import gzip
 import re
+import csv
+import zlib
+import json
+import hashlib
+import base64
+import urllib.request
+import urllib.parse
+import http.client
 
 # ===== DEFAULT CONFIGURATION (MODIFY THESE VALUES) =====
 # Path to ID list file (one SRR ID per line)
@@ -55,45 +58,136 @@ DEFAULT_FORCE = False
 DEFAULT_TERM_WIDTH = 0
 # ===== END OF DEFAULT CONFIGURATION =====
 
-# Suppress warnings
-import warnings
-warnings.simplefilter(action='ignore', category=FutureWarning)
-warnings.simplefilter(action='ignore', category=DeprecationWarning)
-pd.set_option('future.no_silent_downcasting', True)  # Opt-in to future behavior
-
-# Set up logging with thread-safety
-logging.basicConfig(
-    level=logging.INFO,
-    format="[%(asctime)s] %(levelname)s: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
+# Workspace root (the parent of this script's directory); relative paths are resolved against it
+WORKSPACE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# User agent sent with every direct HTTP request
+USER_AGENT = "Mozilla/5.0 Amalgkit/1.0 (SRA Download Tool; https://github.com/amalgkit; Please contact your@email.com if download issues)"
+
+# curl exit status when the server cannot resume a partial transfer
+CURL_RANGE_ERROR = 33
+
+# Magic bytes at the start of every gzip member
+GZIP_MAGIC = b"\x1f\x8b"
+# Filename suffixes produced by the SRA toolkit, EBI and amalgkit, in order of preference
+PAIRED_SUFFIXES = (
+    # SRA toolkit patterns
+    ("_1.fastq.gz", "_2.fastq.gz"),
+    ("_1.fastq", "_2.fastq"),
+    (".1.fastq.gz", ".2.fastq.gz"),
+    (".1.fastq", ".2.fastq"),
+    # Amalgkit patterns
+    ("_1.fq.gz", "_2.fq.gz"),
+    ("_1.fq", "_2.fq"),
 )
+SINGLE_SUFFIXES = (".fastq.gz", ".fastq", ".fq.gz", ".fq")
+SINGLE_SUFFIX_GROUPS = tuple((suffix,) for suffix in SINGLE_SUFFIXES)
+# Well-formed SRA/ENA/DDBJ run accession
+SRR_ID_RE = re.compile(r'^[EDS]RR\d{6,}$')
+# Markers of an HTML error page served in place of a FASTQ file
+HTML_ERROR_MARKERS = re.compile(rb'(?i)<!doctype html|<html|error|not found|404')
+# amalgkit getfastq output lines worth passing through to the log
+AMALGKIT_LOG_RE = re.compile(r'Total bases:|Downloading SRA|Time elapsed|Library layout|ERROR|Warning|Exception')
+# SRRs per bulk EBI curl batch, as a multiple of the EBI connection limit
+BULK_BATCH_FACTOR = 4
+# Directory-name prefix of the per-mirror staging directories used by the EBI/NCBI race
+STAGING_PREFIX = ".staging_"
+# Upper bound on the bytes read to find the end of the first FASTQ record (long reads can span megabytes)
+FASTQ_HEAD_MAX_BYTES = 64 << 20
+FASTQ_HEAD_CHUNK = 1 << 16
+# First FASTQ record: @header, sequence (IUPAC codes, possibly empty), + separator, then a quality line
+FASTQ_HEAD_RE = re.compile(rb'@[^\n]*\n[A-Za-z.*-]*\r?\n\+[^\n]*\n(?:[^\n]|\r?\n)')
+
 logger = logging.getLogger("smart_downloader")
 
-# Create a lock for thread-safe logging
-log_lock = Lock()
+# Unbounded queue drained by a single listener thread, so workers never block on log output
+log_queue = SimpleQueue()
 # Progress display lock
 progress_lock = Lock()
+# Validation sidecar lock
+validation_lock = Lock()
+# Per-thread transfer state; holds the cancel event while mirrors are raced
+transfer_state = threading.local()
+# Set on Ctrl-C so every in-flight transfer stops and keeps its partial file
+shutdown_event = threading.Event()
+# Transfers allowed in flight per mirror, so many workers do not trip rate limits
+# (override with AMALGKIT_EBI_CONNECTIONS / AMALGKIT_NCBI_CONNECTIONS)
+HOST_CONNECTION_LIMITS = {
+    "ebi": int(os.environ.get("AMALGKIT_EBI_CONNECTIONS", 6)),
+    "ncbi": int(os.environ.get("AMALGKIT_NCBI_CONNECTIONS", 4)),
+}
+HOST_SEMAPHORES = {host: threading.BoundedSemaphore(limit) for host, limit in HOST_CONNECTION_LIMITS.items()}
+# Result of the last connectivity probe per endpoint:
+# {"ok": status < 400, "reachable": got any HTTP answer, "rtt": seconds, "t": monotonic time}
+MIRROR_STATE = {}
+# Seconds a probe result is trusted before the endpoint is probed again
+MIRROR_STATE_TTL = 300
+mirror_state_lock = Lock()
 
-# Terminal width for progress bars
-if DEFAULT_TERM_WIDTH <= 0:
-    try:
-        terminal_width = shutil.get_terminal_size().columns
-    except:
-        terminal_width = 80
-else:
-    terminal_width = DEFAULT_TERM_WIDTH
+# Final report shared by stdout, the log and download_summary.txt
+SUMMARY_TEMPLATE = (
+    "Total SRA entries: {total}\n"
+    "Successfully downloaded: {successful}\n"
+    "Skipped (already exists): {skipped}\n"
+    "Failed: {failed}\n"
+    "Total time: {minutes:.1f} minutes\n"
+)
+
+# Progress bar status icons and redraw throttle
+SUCCESS_ICON = "✅"
+SKIPPED_ICON = "⏭️"
+FAILED_ICON = "❌"
+TIME_ICON = "⏱️"
+PROGRESS_REDRAW_INTERVAL = 0.1
+last_progress_draw = 0.0
+
+# Terminal width for progress bars (resolved in init_runtime)
+terminal_width = DEFAULT_TERM_WIDTH if DEFAULT_TERM_WIDTH > 0 else 80
+# Banner rule across the terminal, built once terminal_width is known
+separator = "=" * terminal_width
+# Fixed-width rule for log records
+LOG_SEPARATOR = "=" * 60
+# Decode every downloaded file in full instead of checking only the first record (--strict_validation)
+strict_validation = False
+
+def init_runtime(args):
+    """Set up logging, the terminal width and runtime options when run as a script rather than at import."""
+    global terminal_width, separator, strict_validation
+    strict_validation = args.strict_validation
+    # Every worker can hold NCBI and probe connections at once; keep enough idle ones that none are dropped
+    HTTP_POOL.max_idle_per_host = max(HTTP_POOL.max_idle_per_host, args.max_concurrent * 2)
+
+    # Set up logging with thread-safety
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(
+        fmt="[%(asctime)s] %(levelname)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    ))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    # Terminal width for progress bars
+    if DEFAULT_TERM_WIDTH <= 0:
+        try:
+            terminal_width = shutil.get_terminal_size().columns
+        except:
+            terminal_width = 80
+    else:
+        terminal_width = DEFAULT_TERM_WIDTH
+    separator = "=" * terminal_width
+
+def abs_path(path):
+    """Resolve a path relative to the workspace root, leaving absolute paths as they are."""
+    return path if os.path.isabs(path) else os.path.join(WORKSPACE_ROOT, path)
 
 def safe_log(level, message):
     """Thread-safe logging function."""
-    with log_lock:
-        if level == "info":
-            logger.info(message)
-        elif level == "error":
-            logger.error(message)
-        elif level == "warning":
-            logger.warning(message)
-        elif level == "debug":
-            logger.debug(message)
+    # Records are only queued here; the listener thread formats and writes them
+    getattr(logger, level)(message)
 
 def parse_args():
     """Parse command line arguments."""
@@ -106,8 +200,102 @@ def parse_args():
     parser.add_argument("--force", action="store_true", default=DEFAULT_FORCE, help="Force redownload of existing files")
     parser.add_argument("--amalgkit_path", default=DEFAULT_AMALGKIT_PATH, help=f"Path to amalgkit executable (default: {DEFAULT_AMALGKIT_PATH})")
     parser.add_argument("--test", action="store_true", help="Only check connectivity and SRA toolkit installation without downloading")
+    parser.add_argument("--strict_validation", action="store_true", help="Decompress and check every downloaded FASTQ file in full (slow for large files)")
     return parser.parse_args()
 
+def read_fastq_head(file_path, max_bytes=FASTQ_HEAD_MAX_BYTES):
+    """Return the start of a FASTQ file up to its fourth line break, inflating gzipped files incrementally."""
+    chunks = []
+    line_breaks = 0
+    head_size = 0
+    with open(file_path, 'rb') as f:
+        decompressor = None
+        if file_path.endswith('.gz'):
+            pending = f.read(FASTQ_HEAD_CHUNK)
+            # HTML error pages and other non-gzip payloads cannot carry the gzip magic bytes
+            if pending[:2] != GZIP_MAGIC:
+                raise ValueError("missing gzip magic bytes")
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        # Keep reading until the whole first record is in hand, so long reads are not cut off
+        while line_breaks < 4 and head_size < max_bytes:
+            if decompressor is None:
+                chunk = f.read(FASTQ_HEAD_CHUNK)
+                if not chunk:
+                    break
+            else:
+                if not pending:
+                    if decompressor.eof:
+                        break
+                    pending = f.read(FASTQ_HEAD_CHUNK)
+                    if not pending:
+                        break
+                # Bounded inflate so a highly compressible stream cannot balloon in memory
+                chunk = decompressor.decompress(pending, FASTQ_HEAD_CHUNK)
+                pending = decompressor.unconsumed_tail
+            chunks.append(chunk)
+            line_breaks += chunk.count(b'\n')
+            head_size += len(chunk)
+    return b''.join(chunks)
+
+def advise_file(f, advice):
+    """Pass a page-cache access hint (e.g. "POSIX_FADV_SEQUENTIAL") for a whole open file, where supported."""
+    if hasattr(os, "posix_fadvise"):
+        with contextlib.suppress(OSError):
+            os.posix_fadvise(f.fileno(), 0, 0, getattr(os, advice))
+
+def count_decompressed_lines(file_path):
+    """Inflate a gzip file in a pigz/gzip child process, returning (line count, last byte)."""
+    # Decompression runs in its own process, so concurrent strict checks are not serialised by the GIL
+    decompressor = resolve_tool("pigz") if has_tool("pigz") else resolve_tool("gzip")
+    process = subprocess.Popen([decompressor, "-dc", file_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    line_count = 0
+    last_byte = b'\n'
+    try:
+        while True:
+            chunk = process.stdout.read(1 << 20)
+            if not chunk:
+                break
+            line_count += chunk.count(b'\n')
+            last_byte = chunk[-1:]
+        stderr = process.stderr.read()
+    except BaseException:
+        # A read that fails (or is interrupted) part way must not leave the child running
+        process.kill()
+        process.wait()
+        raise
+    if process.wait() != 0:
+        raise OSError(stderr.decode(errors='replace').strip() or f"{decompressor} exited with {process.returncode}")
+    return line_count, last_byte
+
+def is_complete_fastq_file(file_path):
+    """Decode a whole FASTQ file, checking that it is not truncated and holds whole 4-line records."""
+    line_count = 0
+    last_byte = b'\n'
+    try:
+        if file_path.endswith('.gz') and (has_tool("pigz") or has_tool("gzip")):
+            line_count, last_byte = count_decompressed_lines(file_path)
+        else:
+            with open(file_path, 'rb') as raw:
+                advise_file(raw, "POSIX_FADV_SEQUENTIAL")
+                f = gzip.GzipFile(fileobj=raw) if file_path.endswith('.gz') else raw
+                while True:
+                    chunk = f.read(1 << 20)
+                    if not chunk:
+                        break
+                    line_count += chunk.count(b'\n')
+                    last_byte = chunk[-1:]
+                # The file was read once end to end; nothing here reads it again
+                advise_file(raw, "POSIX_FADV_DONTNEED")
+    except (EOFError, OSError, zlib.error) as e:
+        safe_log("error", f"  File {file_path} is truncated or corrupt: {e}")
+        return False
+    if last_byte != b'\n':
+        line_count += 1
+    if line_count % 4:
+        safe_log("error", f"  File {file_path} has {line_count} lines, not a whole number of FASTQ records")
+        return False
+    return True
+
 def is_valid_fastq_file(file_path):
     """Check if a file is a valid FASTQ file and not an HTML error page."""
     try:
@@ -118,298 +306,267 @@ def is_valid_fastq_file(file_path):
             # Check if it's an HTML error page
             try:
                 with open(file_path, 'rb') as f:
-                    header = f.read(200).decode('utf-8', errors='ignore').lower()
-                    if any(error_marker in header for error_marker in ['<!doctype html', '<html', 'error', 'not found', '404']):
+                    if HTML_ERROR_MARKERS.search(f.read(512)):
                         safe_log("error", f"  File {file_path} is an HTML error page, not a FASTQ file")
                         return False
             except Exception as e:
                 safe_log("error", f"  Error reading file header {file_path}: {e}")
                 return False
-                
-        # If gzipped, try to check the first few bytes
-        if file_path.endswith('.gz'):
-            try:
-                with gzip.open(file_path, 'rt', errors='ignore') as f:
-                    # Try to read the first 4 lines of the FASTQ file
-                    lines = []
-                    for _ in range(4):
-                        try:
-                            line = f.readline()
-                            if not line:  # End of file
-                                break
-                            lines.append(line)
-                        except Exception as e:
-                            safe_log("error", f"  Error reading line from gzipped file {file_path}: {e}")
-                            return False
-                    
-                    # Not enough lines
-                    if len(lines) < 4:
-                        safe_log("error", f"  File {file_path} has fewer than 4 lines, not a valid FASTQ")
-                        return False
-                    
-                    # Valid FASTQ starts with @, then sequence, then +, then quality
-                    if not lines[0].startswith('@'):
-                        safe_log("error", f"  File {file_path} does not start with @ character expected in FASTQ format")
-                        return False
-                    
-                    if not lines[2].startswith('+'):
-                        safe_log("error", f"  File {file_path} does not have the + character separating sequence and quality")
-                        return False
-                    
-                    return True
-            except (gzip.BadGzipFile, IOError, UnicodeDecodeError) as e:
-                safe_log("error", f"  File {file_path} is not a valid gzip file or has encoding issues: {e}")
-                return False
-        # If not gzipped, check directly
-        else:
-            try:
-                with open(file_path, 'rt', errors='ignore') as f:
-                    # Try to read the first 4 lines of the FASTQ file
-                    lines = []
-                    for _ in range(4):
-                        try:
-                            line = f.readline()
-                            if not line:  # End of file
-                                break
-                            lines.append(line)
-                        except Exception as e:
-                            safe_log("error", f"  Error reading line from file {file_path}: {e}")
-                            return False
-                    
-                    # Not enough lines
-                    if len(lines) < 4:
-                        safe_log("error", f"  File {file_path} has fewer than 4 lines, not a valid FASTQ")
-                        return False
-                    
-                    # Valid FASTQ starts with @, then sequence, then +, then quality
-                    if not lines[0].startswith('@'):
-                        safe_log("error", f"  File {file_path} does not start with @ character expected in FASTQ format")
-                        return False
-                    
-                    if not lines[2].startswith('+'):
-                        safe_log("error", f"  File {file_path} does not have the + character separating sequence and quality")
-                        return False
-                    
-                    return True
-            except (IOError, UnicodeDecodeError) as e:
-                safe_log("error", f"  Could not read file {file_path} or has encoding issues: {e}")
-                return False
+
+        try:
+            head = read_fastq_head(file_path)
+        except (ValueError, IOError, zlib.error) as e:
+            safe_log("error", f"  File {file_path} is not a valid gzip file or could not be read: {e}")
+            return False
+
+        # Valid FASTQ starts with @, then sequence, then +, then quality
+        if not FASTQ_HEAD_RE.match(head):
+            safe_log("error", f"  File {file_path} does not start with a complete FASTQ record")
+            return False
+
+        if strict_validation and not is_complete_fastq_file(file_path):
+            return False
     except Exception as e:
         safe_log("error", f"  Error validating FASTQ file {file_path}: {e}")
         return False
-    
+
     # If we get here, the file passed basic checks
     return True
 
-def verify_and_clean_downloads(fastq_dir, srr_id, is_paired=False):
-    """Verify downloaded files are valid FASTQ and remove invalid ones."""
-    # Check for all possible file patterns
-    valid_files_found = False
-    
-    # Patterns for FASTQ files
-    if is_paired:
-        file_pairs = [
-            (f"{srr_id}_1.fastq.gz", f"{srr_id}_2.fastq.gz"),
-            (f"{srr_id}_1.fastq", f"{srr_id}_2.fastq"),
-            (f"{srr_id}.1.fastq.gz", f"{srr_id}.2.fastq.gz"),
-            (f"{srr_id}.1.fastq", f"{srr_id}.2.fastq"),
-            (f"{srr_id}_1.fq.gz", f"{srr_id}_2.fq.gz"),
-            (f"{srr_id}_1.fq", f"{srr_id}_2.fq")
-        ]
-        
-        for file_pair in file_pairs:
-            file1_path = os.path.join(fastq_dir, file_pair[0])
-            file2_path = os.path.join(fastq_dir, file_pair[1])
-            
-            if os.path.exists(file1_path) and os.path.exists(file2_path):
-                valid1 = is_valid_fastq_file(file1_path)
-                valid2 = is_valid_fastq_file(file2_path)
-                
-                if valid1 and valid2:
-                    safe_log("info", f"  Verified valid FASTQ pair: {file_pair[0]} and {file_pair[1]}")
-                    valid_files_found = True
-                    break
-                elif not valid1:
-                    safe_log("warning", f"  Invalid FASTQ file: {file_pair[0]} - Removing")
-                    try:
-                        os.remove(file1_path)
-                    except Exception as e:
-                        safe_log("error", f"  Failed to remove invalid file {file1_path}: {e}")
-                elif not valid2:
-                    safe_log("warning", f"  Invalid FASTQ file: {file_pair[1]} - Removing")
-                    try:
-                        os.remove(file2_path)
-                    except Exception as e:
-                        safe_log("error", f"  Failed to remove invalid file {file2_path}: {e}")
-    else:
-        # Single-end patterns
-        single_files = [
-            f"{srr_id}.fastq.gz",
-            f"{srr_id}.fastq",
-            f"{srr_id}.fq.gz",
-            f"{srr_id}.fq"
+def get_validation_cache_path(fastq_dir, srr_id):
+    """Return the path of the validation sidecar for an SRR directory."""
+    return os.path.join(fastq_dir, f".{srr_id}.validated.json")
+
+def load_validation_cache(cache_file):
+    """Load the validation sidecar, returning an empty cache if it is missing or unreadable."""
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def get_fastq_fingerprint(file_path, file_stat=None):
+    """Return the [size, mtime, sha1 of the first 4KB] triple used as the validation cache key."""
+    if file_stat is None:
+        file_stat = os.stat(file_path)
+    with open(file_path, 'rb') as f:
+        head_digest = hashlib.sha1(f.read(4096)).hexdigest()
+    return [file_stat.st_size, file_stat.st_mtime_ns, head_digest]
+
+def is_valid_fastq_file_cached(fastq_dir, srr_id, file_path, file_stat=None):
+    """Check a FASTQ file, skipping the decode when the sidecar already vouches for it."""
+    cache_file = get_validation_cache_path(fastq_dir, srr_id)
+    file_name = os.path.basename(file_path)
+    try:
+        fingerprint = get_fastq_fingerprint(file_path, file_stat)
+    except OSError as e:
+        safe_log("error", f"  Error reading file {file_path}: {e}")
+        return False
+
+    with validation_lock:
+        cache = load_validation_cache(cache_file)
+    # Entries are the fingerprint followed by whether the file passed the full strict check
+    cached = cache.get(file_name)
+    if cached and cached[:3] == fingerprint and (cached[3:4] == [True] or not strict_validation):
+        safe_log("debug", f"  Validation cache hit for {file_path}")
+        return True
+
+    if not is_valid_fastq_file(file_path):
+        return False
+
+    # Only passing files are recorded; a changed size, mtime or head invalidates the entry
+    with validation_lock:
+        cache = load_validation_cache(cache_file)
+        cache[file_name] = fingerprint + [strict_validation]
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump(cache, f)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            safe_log("debug", f"  Could not update validation cache {cache_file}: {e}")
+    return True
+
+def scan_directory(directory):
+    """Return a {name: DirEntry} listing of a directory, empty if it does not exist."""
+    try:
+        with os.scandir(directory) as it:
+            return {entry.name: entry for entry in it}
+    except FileNotFoundError:
+        return {}
+
+def get_candidate_groups(srr_id, paired):
+    """Return the candidate filename groups for an SRR ID: mate pairs if paired, single files otherwise."""
+    suffix_groups = PAIRED_SUFFIXES if paired else SINGLE_SUFFIX_GROUPS
+    return [tuple(srr_id + suffix for suffix in group) for group in suffix_groups]
+
+def find_valid_group(fastq_dir, srr_id, paired, entries):
+    """Return the first candidate group whose files are all valid FASTQ, removing invalid files on the way."""
+    for group in get_candidate_groups(srr_id, paired):
+        if not all(file_name in entries for file_name in group):
+            continue
+        results = [
+            is_valid_fastq_file_cached(fastq_dir, srr_id, os.path.join(fastq_dir, file_name), entries[file_name].stat())
+            for file_name in group
         ]
-        
-        for file_name in single_files:
-            file_path = os.path.join(fastq_dir, file_name)
-            
-            if os.path.exists(file_path):
-                valid = is_valid_fastq_file(file_path)
-                
-                if valid:
-                    safe_log("info", f"  Verified valid FASTQ file: {file_name}")
-                    valid_files_found = True
-                    break
-                else:
-                    safe_log("warning", f"  Invalid FASTQ file: {file_name} - Removing")
-                    try:
-                        os.remove(file_path)
-                    except Exception as e:
-                        safe_log("error", f"  Failed to remove invalid file {file_path}: {e}")
+        if all(results):
+            return group
+        for file_name, valid in zip(group, results):
+            if not valid:
+                file_path = os.path.join(fastq_dir, file_name)
+                safe_log("warning", f"  Invalid FASTQ file: {file_name} - Removing")
+                try:
+                    os.remove(file_path)
+                except Exception as e:
+                    safe_log("error", f"  Failed to remove invalid file {file_path}: {e}")
+    return None
+
+def verify_and_clean_downloads(fastq_dir, srr_id, is_paired=False, entries=None):
+    """Verify downloaded files are valid FASTQ and remove invalid ones."""
+    if entries is None:
+        entries = scan_directory(fastq_dir)
+    
+    valid_group = find_valid_group(fastq_dir, srr_id, is_paired, entries)
+    if valid_group:
+        safe_log("info", f"  Verified valid FASTQ {'pair' if len(valid_group) > 1 else 'file'}: {' and '.join(valid_group)}")
+        return True
     
     # Remove the completion marker if no valid files were found
-    if not valid_files_found:
-        marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
-        if os.path.exists(marker_file):
-            try:
-                os.remove(marker_file)
-                safe_log("warning", f"  Removed invalid completion marker for {srr_id}")
-            except Exception as e:
-                safe_log("error", f"  Failed to remove completion marker {marker_file}: {e}")
+    marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
+    if f"{srr_id}.completed" in entries:
+        try:
+            os.remove(marker_file)
+            safe_log("warning", f"  Removed invalid completion marker for {srr_id}")
+        except Exception as e:
+            safe_log("error", f"  Failed to remove completion marker {marker_file}: {e}")
     
-    return valid_files_found
+    return False
+
+def mark_done(fastq_dir, srr_id):
+    """Write the completion marker for an SRR directory with a single open/write/close."""
+    marker_fd = os.open(os.path.join(fastq_dir, f"{srr_id}.completed"), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(marker_fd, f"Downloaded and verified on {datetime.now().isoformat()}".encode())
+    finally:
+        os.close(marker_fd)
 
 def check_existing_files(srr_id, out_dir, paired=False):
     """Check if files for an SRR ID already exist."""
     fastq_dir = os.path.join(out_dir, srr_id)
+    # One directory read serves every existence and size check below
+    entries = scan_directory(fastq_dir)
     
-    # Check for completed marker file
-    marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
-    if os.path.exists(marker_file):
+    # Check for completed marker file; a failed verification also removes the marker
+    if f"{srr_id}.completed" in entries:
         # Verify the downloads are valid even if the marker exists
-        if verify_and_clean_downloads(fastq_dir, srr_id, paired):
-            return True
-        else:
-            # If verification failed, remove the marker
-            try:
-                os.remove(marker_file)
-            except:
-                pass
-            return False
-    
-    # Check all possible filename patterns
-    patterns = []
-    
-    # Common patterns produced by different tools
-    if paired:
-        patterns.extend([
-            # SRA toolkit patterns
-            (f"{srr_id}_1.fastq.gz", f"{srr_id}_2.fastq.gz"),
-            (f"{srr_id}_1.fastq", f"{srr_id}_2.fastq"),
-            (f"{srr_id}.1.fastq.gz", f"{srr_id}.2.fastq.gz"),
-            (f"{srr_id}.1.fastq", f"{srr_id}.2.fastq"),
-            # Amalgkit patterns
-            (f"{srr_id}_1.fq.gz", f"{srr_id}_2.fq.gz"),
-            (f"{srr_id}_1.fq", f"{srr_id}_2.fq"),
-        ])
-    else:
-        patterns.extend([
-            # Single-end patterns
-            f"{srr_id}.fastq.gz",
-            f"{srr_id}.fastq",
-            f"{srr_id}.fq.gz",
-            f"{srr_id}.fq"
-        ])
+        return verify_and_clean_downloads(fastq_dir, srr_id, paired, entries)
     
     # Debug existing files
-    if os.path.exists(fastq_dir):
-        existing_files = os.listdir(fastq_dir)
-        safe_log("debug", f"Existing files in {fastq_dir}: {existing_files}")
+    if entries:
+        safe_log("debug", f"Existing files in {fastq_dir}: {list(entries)}")
         
-        # Check paired patterns
-        if paired:
-            for pattern_pair in patterns:
-                file1_path = os.path.join(fastq_dir, pattern_pair[0])
-                file2_path = os.path.join(fastq_dir, pattern_pair[1])
-                if (os.path.exists(file1_path) and os.path.getsize(file1_path) > 0 and
-                    os.path.exists(file2_path) and os.path.getsize(file2_path) > 0):
-                    
-                    # Verify these are valid FASTQ files
-                    if is_valid_fastq_file(file1_path) and is_valid_fastq_file(file2_path):
-                        # Files exist and are valid, create marker file
-                        with open(marker_file, 'w') as f:
-                            f.write(f"Downloaded and verified on {datetime.now().isoformat()}")
-                        return True
-                    else:
-                        # Invalid files, remove them
-                        if not is_valid_fastq_file(file1_path):
-                            try:
-                                os.remove(file1_path)
-                            except:
-                                pass
-                        if not is_valid_fastq_file(file2_path):
-                            try:
-                                os.remove(file2_path)
-                            except:
-                                pass
-        else:
-            # Check single-end patterns
-            for pattern in patterns:
-                file_path = os.path.join(fastq_dir, pattern)
-                if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                    # Verify it's a valid FASTQ file
-                    if is_valid_fastq_file(file_path):
-                        # File exists and is valid, create marker file
-                        with open(marker_file, 'w') as f:
-                            f.write(f"Downloaded and verified on {datetime.now().isoformat()}")
-                        return True
-                    else:
-                        # Invalid file, remove it
-                        try:
-                            os.remove(file_path)
-                        except:
-                            pass
+        if find_valid_group(fastq_dir, srr_id, paired, entries):
+            # Files exist and are valid, create marker file
+            mark_done(fastq_dir, srr_id)
+            return True
     
     return False
 
-def get_layout_from_metadata(metadata_file, srr_id):
-    """Determine if an SRR entry is single or paired-end from metadata."""
+def get_metadata_columns(columns):
+    """Decide once which (run, layout) column names a metadata header uses."""
+    if 'run_accession' in columns:
+        return 'run_accession', 'library_layout'
+    # Use 'run' column instead of 'run_accession'
+    return 'run', 'lib_layout'
+
+def load_layout_map(metadata_file):
+    """Parse the metadata TSV once into a {srr_id: is_paired} lookup."""
     try:
-        metadata = pd.read_csv(metadata_file, sep='\t')
-        
-        # Debug available columns
-        if 'run_accession' not in metadata.columns:
-            # Use 'run' column instead of 'run_accession'
-            if 'run' in metadata.columns:
-                entry = metadata[metadata['run'] == srr_id]
-                if not entry.empty and 'lib_layout' in metadata.columns:
-                    layout = entry['lib_layout'].iloc[0]
-                    return layout.lower() == 'paired'
-            return None  # Unknown
-        
-        entry = metadata[metadata['run_accession'] == srr_id]
-        if not entry.empty and 'library_layout' in entry.columns:
-            layout = entry['library_layout'].iloc[0]
-            return layout.lower() == 'paired'
-        return None  # Unknown
+        mtime_ns = os.stat(metadata_file).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    return read_layout_map(metadata_file, mtime_ns)
+
+@functools.lru_cache(maxsize=4)
+def read_layout_map(metadata_file, mtime_ns):
+    """Parse a metadata TSV; cached per (path, mtime) so an unchanged file is never parsed twice."""
+    try:
+        with open(metadata_file, 'r', newline='') as f:
+            reader = csv.reader(f, delimiter='\t')
+            columns = next(reader, [])
+            id_column, layout_column = get_metadata_columns(columns)
+            if id_column not in columns or layout_column not in columns:
+                return {}
+
+            # Only the two needed fields are picked out of each row, by position, without building a dict per row
+            id_index = columns.index(id_column)
+            layout_index = columns.index(layout_column)
+            min_length = max(id_index, layout_index) + 1
+            layout_map = {}
+            for row in reader:
+                if len(row) < min_length:
+                    continue
+                srr_id = row[id_index]
+                layout = row[layout_index]
+                # Keep the first entry per run, skipping rows without a layout
+                if srr_id and layout and srr_id not in layout_map:
+                    layout_map[srr_id] = layout.lower() == 'paired'
     except Exception as e:
-        safe_log("warning", f"Error reading metadata for {srr_id}: {e}")
-        return None
+        safe_log("warning", f"Error reading metadata {metadata_file}: {e}")
+        return {}
+    return layout_map
+
+def get_layout(layout_map, srr_id):
+    """Determine if an SRR entry is single or paired-end from the metadata layout map."""
+    return layout_map.get(srr_id)  # None if unknown
 
 def fix_directory_permissions(directory):
     """Ensure directory has proper permissions."""
     try:
         # Make sure directory exists
-        os.makedirs(directory, exist_ok=True)
+        try:
+            mode = os.stat(directory).st_mode
+        except FileNotFoundError:
+            os.makedirs(directory, exist_ok=True)
+            mode = os.stat(directory).st_mode
         
-        # Set permissions to writable
-        os.chmod(directory, 0o755)  # rwxr-xr-x
+        # Set permissions to writable, unless they already are
+        if mode & 0o777 != 0o755:
+            os.chmod(directory, 0o755)  # rwxr-xr-x
         
         return True
     except Exception as e:
         safe_log("error", f"Error fixing permissions for {directory}: {e}")
         return False
 
+@functools.lru_cache(maxsize=None)
+def resolve_tool(name):
+    """Resolve an executable on PATH once, so each spawn execs it directly."""
+    # Commands are always passed as argument lists without a shell, preexec_fn or start_new_session,
+    # which lets CPython start them with vfork() on Linux instead of copying the parent with fork()
+    return shutil.which(name) or name
+
+@functools.lru_cache(maxsize=None)
+def has_tool(name):
+    """Check once whether an executable is on PATH, instead of spawning `which` per SRR."""
+    return shutil.which(name) is not None
+
+def forget_tool_lookups():
+    """Drop cached PATH lookups after tools have been installed."""
+    has_tool.cache_clear()
+    resolve_tool.cache_clear()
+
+def compress_fastq_files(fastq_paths, threads):
+    """Gzip FASTQ files in place, with pigz when available or one gzip per file in parallel."""
+    if not fastq_paths:
+        return
+    if has_tool("pigz"):
+        subprocess.run([resolve_tool("pigz"), "-p", str(max(1, threads)), "-f"] + fastq_paths, check=False)
+        return
+    # Stock gzip is single-threaded, so at least compress the mates side by side
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(fastq_paths)) as executor:
+        list(executor.map(lambda fastq_path: subprocess.run([resolve_tool("gzip"), "-f", fastq_path], check=False), fastq_paths))
+
 def download_sra_directly(srr_id, out_dir, threads):
     """Use SRA toolkit directly to download faster."""
     try:
@@ -422,11 +579,8 @@ def download_sra_directly(srr_id, out_dir, threads):
         
         # First use prefetch to get the SRA file
         safe_log("info", f"  Running prefetch for {srr_id}...")
-        prefetch_cmd = ["prefetch", srr_id, "--progress", "--max-size", "50G"]
-        prefetch_proc = subprocess.run(prefetch_cmd, 
-                                    stdout=subprocess.PIPE, 
-                                    stderr=subprocess.STDOUT,
-                                    text=True, check=False)
+        prefetch_cmd = [resolve_tool("prefetch"), srr_id, "--progress", "--max-size", "50G"]
+        prefetch_proc = run_transfer_command(prefetch_cmd, stderr=subprocess.STDOUT)
         
         if prefetch_proc.returncode != 0:
             safe_log("error", f"  Prefetch failed: {prefetch_proc.stdout}")
@@ -434,31 +588,32 @@ def download_sra_directly(srr_id, out_dir, threads):
             
         # Then convert to fastq using fasterq-dump
         safe_log("info", f"  Running fasterq-dump for {srr_id}...")
-        fasterq_cmd = ["fasterq-dump", srr_id, 
+        fasterq_cmd = [resolve_tool("fasterq-dump"), srr_id, 
                       "--outdir", fastq_dir,
+                      # Scratch files go next to the output rather than into the working directory,
+                      # so the final FASTQ is produced by a same-volume rename instead of a copy
+                      "--temp", fastq_dir,
                       "--threads", str(threads),
                       "--progress",
                       "--split-files"]
         
-        fasterq_proc = subprocess.run(fasterq_cmd, 
-                                    stdout=subprocess.PIPE, 
-                                    stderr=subprocess.STDOUT,
-                                    text=True, check=False)
+        fasterq_proc = run_transfer_command(fasterq_cmd, stderr=subprocess.STDOUT)
         
         if fasterq_proc.returncode != 0:
             safe_log("error", f"  Fasterq-dump failed: {fasterq_proc.stdout}")
             return False
             
+        # fasterq-dump --split-files names its output deterministically, so probe those names
+        # instead of listing a directory that other workers may be writing into
+        produced = [suffix for suffix in ("_1.fastq", "_2.fastq", ".fastq")
+                    if os.path.exists(os.path.join(fastq_dir, srr_id + suffix))]
+        
         # Compress the files
         safe_log("info", f"  Compressing fastq files for {srr_id}...")
-        for file in os.listdir(fastq_dir):
-            if file.endswith('.fastq'):
-                fastq_path = os.path.join(fastq_dir, file)
-                gzip_cmd = ["gzip", fastq_path]
-                subprocess.run(gzip_cmd, check=False)
+        compress_fastq_files([os.path.join(fastq_dir, srr_id + suffix) for suffix in produced], threads)
         
         # Verify the output files are valid FASTQ files
-        is_paired = len([f for f in os.listdir(fastq_dir) if f.endswith('_1.fastq.gz') or f.endswith('_2.fastq.gz')]) > 1
+        is_paired = "_1.fastq" in produced and "_2.fastq" in produced
         if verify_and_clean_downloads(fastq_dir, srr_id, is_paired):
             return True
         else:
@@ -491,6 +646,429 @@ def configure_proxy():
     # Note: We don't actually prompt here since it would block the script
     # In a real interactive script, you might want to add a prompt
 
+@functools.lru_cache(maxsize=None)
+def get_curl_info():
+    """Return the installed curl (major, minor) version and feature set, checked once per run."""
+    try:
+        version_output = subprocess.run([resolve_tool("curl"), "--version"], stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True, check=False).stdout
+    except OSError:
+        return (0, 0), frozenset()
+    match = re.match(r'curl (\d+)\.(\d+)', version_output)
+    version = (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+    features = re.search(r'^Features:(.*)$', version_output, re.M)
+    return version, frozenset(features.group(1).split() if features else ())
+
+@functools.lru_cache(maxsize=None)
+def get_curl_base():
+    """Return the curl arguments shared by every download, negotiating HTTP/2 when curl supports it."""
+    curl_base = [resolve_tool("curl"), "-L", "-f"]
+    if "HTTP2" in get_curl_info()[1]:
+        curl_base.append("--http2")
+    curl_base += ["--keepalive-time", "60", "--connect-timeout", "30", "-A", USER_AGENT]
+    return tuple(curl_base)
+
+def transfer_cancelled():
+    """Check whether the transfer running on this thread has lost a mirror race or the run was interrupted."""
+    if shutdown_event.is_set():
+        return True
+    cancel_event = getattr(transfer_state, "cancel_event", None)
+    return cancel_event is not None and cancel_event.is_set()
+
+def run_transfer_command(cmd, input=None, stderr=subprocess.PIPE):
+    """Run a download command like subprocess.run, killing it as soon as the transfer is cancelled."""
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=stderr,
+        text=True
+    )
+    while True:
+        try:
+            stdout, stderr = process.communicate(input, timeout=0.5)
+            break
+        except subprocess.TimeoutExpired:
+            if transfer_cancelled():
+                process.kill()
+                stdout, stderr = process.communicate()
+                break
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+def kill_on_shutdown(process):
+    """Kill a child process if the run is interrupted before the child exits."""
+    while process.poll() is None:
+        if shutdown_event.wait(0.5):
+            process.kill()
+            return
+
+def size_or_none(path):
+    """Return a file's size from a single stat, or None if it does not exist."""
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+
+def fast_move(src, dst):
+    """Rename a file into place, copying only when it has to cross filesystems."""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+def get_partial_path(output_path):
+    """Return where an in-progress download of output_path is kept until it completes."""
+    return f"{output_path}.part"
+
+def get_aria2_control_path(output_path):
+    """Return the control file in which aria2c records the segments of a partial download it has written."""
+    return f"{get_partial_path(output_path)}.aria2"
+
+def discard_aria2_partial(output_path):
+    """Delete a partial download left by aria2c, and its control file, returning whether there was one."""
+    control_path = get_aria2_control_path(output_path)
+    if not os.path.exists(control_path):
+        return False
+    for path in (get_partial_path(output_path), control_path):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+    return True
+
+def finish_partial_downloads(results, restart=()):
+    """Move completed partial downloads into place and discard partials that cannot be resumed."""
+    for output_path, success in results.items():
+        partial_path = get_partial_path(output_path)
+        if success:
+            try:
+                os.replace(partial_path, output_path)
+            except FileNotFoundError:
+                # A 200 with an empty body may never create the partial file
+                results[output_path] = False
+        elif output_path in restart:
+            # The server cannot continue this file (no range support, or the partial is longer than
+            # the remote), so the next attempt starts from byte 0
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(partial_path)
+    return results
+
+def curl_config_quote(value):
+    """Quote a value for a curl -K config file."""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def fetch_with_curl(downloads, parallel_max=4, expected_sizes=None):
+    """Download (url, output_path) pairs with one curl process, returning {output_path: success}.
+
+    expected_sizes optionally maps output paths to the size HEAD reported for them.
+    """
+    curl_version = get_curl_info()[0]
+    # One curl process fetches every mate, sharing DNS/TLS setup and transferring them side by side;
+    # -C - continues any partial file left behind by an interrupted attempt
+    # No overall --max-time, which would cut off multi-GB runs; a transfer is only abandoned
+    # once it has stalled below 1 KB/s for a minute
+    curl_cmd = list(get_curl_base()) + ["-sS", "-C", "-", "--speed-limit", "1024", "--speed-time", "60"]
+    if len(downloads) > 1 and curl_version >= (7, 66):
+        curl_cmd += ["--parallel", "--parallel-max", str(parallel_max)]
+    # curl 7.75+ reports the exit code of every transfer in its --write-out JSON
+    report_per_file = curl_version >= (7, 75)
+    if report_per_file:
+        curl_cmd += ["--write-out", "%{json}\n"]
+    # URLs are read from a config on stdin, so any number of files fits in one command
+    curl_cmd += ["-K", "-"]
+    # aria2c writes its segments at scattered offsets, so resuming one of its partials from EOF would
+    # leave zero-filled holes in the file; those downloads start again from byte 0 instead
+    for _, output_path in downloads:
+        if discard_aria2_partial(output_path):
+            safe_log("debug", f"  Discarded aria2c partial of {output_path} before the curl transfer")
+    config = "".join(
+        f"url = {curl_config_quote(url)}\noutput = {curl_config_quote(get_partial_path(output_path))}\n"
+        for url, output_path in downloads
+    )
+    curl_process = run_transfer_command(curl_cmd, input=config)
+    if not report_per_file:
+        restart = () if curl_process.returncode != CURL_RANGE_ERROR else [output_path for _, output_path in downloads]
+        return finish_partial_downloads({output_path: curl_process.returncode == 0 for _, output_path in downloads}, restart)
+
+    output_paths = {get_partial_path(output_path): output_path for _, output_path in downloads}
+    urls = {output_path: url for url, output_path in downloads}
+    expected_sizes = expected_sizes or {}
+    results = {output_path: False for _, output_path in downloads}
+    restart = []
+    for line in curl_process.stdout.splitlines():
+        try:
+            transfer = json.loads(line)
+        except ValueError:
+            continue
+        output_path = output_paths.get(transfer.get("filename_effective"))
+        if output_path is None:
+            continue
+        if transfer.get("http_code") == 416:
+            # -C - on a partial that already holds the whole file is answered with 416, so the partial
+            # is judged by its size and is only restarted when it is longer than the remote file
+            partial_size = size_or_none(get_partial_path(output_path))
+            remote_size = expected_sizes.get(output_path) or probe_url(urls[output_path])
+            if remote_size and partial_size is not None:
+                results[output_path] = partial_size == remote_size
+                if partial_size > remote_size:
+                    safe_log("debug", f"  Partial of {output_path} is longer than the remote file, restarting it")
+                    restart.append(output_path)
+            else:
+                # Without a remote size, curl's own verdict decides
+                results[output_path] = transfer.get("exitcode") == 0 and partial_size is not None
+                if not results[output_path]:
+                    restart.append(output_path)
+            continue
+        results[output_path] = transfer.get("exitcode") == 0 and transfer.get("http_code") in (200, 206)
+        if not results[output_path]:
+            safe_log("debug", f"  curl transfer of {output_path} failed: exit {transfer.get('exitcode')}, "
+                     f"HTTP {transfer.get('http_code')}")
+            if transfer.get("exitcode") == CURL_RANGE_ERROR or transfer.get("http_code") == 416:
+                restart.append(output_path)
+    return finish_partial_downloads(results, restart)
+
+def fetch_with_aria2c(downloads, expected_sizes=None):
+    """Download (url, output_path) pairs with aria2c, returning {output_path: success}.
+
+    expected_sizes optionally maps output paths to the size HEAD reported for them.
+    """
+    # Each file is split into 1 MiB+ segments fetched over up to 16 ranged connections,
+    # which gets past the per-flow throughput ceiling of a single stream
+    # aria2c input file syntax: the URL, then per-download options indented below it
+    input_list = "".join(
+        f"{url}\n  dir={os.path.dirname(output_path)}\n  out={os.path.basename(get_partial_path(output_path))}\n"
+        for url, output_path in downloads
+    )
+    aria2c_cmd = [
+        resolve_tool("aria2c"),
+        "--input-file=-",
+        f"--max-concurrent-downloads={len(downloads)}",
+        "--max-connection-per-server=16",
+        "--split=16",
+        "--min-split-size=1M",
+        "--continue=true",
+        "--file-allocation=none",
+        "--retry-wait=3",
+        "--max-tries=3",
+        "--allow-overwrite=true",
+        "--auto-file-renaming=false",
+        "--connect-timeout=30",
+        f"--user-agent={USER_AGENT}",
+        "--console-log-level=warn",
+        "--summary-interval=0",
+    ]
+    aria2c_process = run_transfer_command(aria2c_cmd, input=input_list)
+    # aria2c's exit code covers the whole batch, so each file is judged on its own: aria2c removes a
+    # file's control file once every segment is in, and the size must match what HEAD advertised
+    expected_sizes = expected_sizes or {}
+    results = {}
+    for _, output_path in downloads:
+        partial_size = size_or_none(get_partial_path(output_path))
+        expected_size = expected_sizes.get(output_path)
+        results[output_path] = (
+            partial_size is not None
+            and not os.path.exists(get_aria2_control_path(output_path))
+            and (partial_size == expected_size if expected_size else aria2c_process.returncode == 0)
+        )
+    for output_path, success in results.items():
+        # A failed partial with no control file (e.g. aria2c was killed before saving one) cannot
+        # tell which segments it holds, so it is not kept for resuming
+        if not success and not os.path.exists(get_aria2_control_path(output_path)):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(get_partial_path(output_path))
+    return finish_partial_downloads(results)
+
+class HTTPConnectionPool:
+    """Thread-safe pool of keep-alive http.client connections shared by every download worker."""
+
+    def __init__(self, max_idle_per_host=16, timeout=60):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.lock = Lock()
+        self.idle = {}
+
+    def connect(self, scheme, host, port):
+        """Open a new connection, going through the environment's proxy if one applies."""
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = urllib.request.getproxies().get(scheme)
+        if not proxy or urllib.request.proxy_bypass(host):
+            return connection_class(host, port, timeout=self.timeout)
+        # Proxies are often given as bare host:port
+        proxy_parts = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+        proxy_port = proxy_parts.port or (443 if proxy_parts.scheme == "https" else 80)
+        proxy_headers = {}
+        if proxy_parts.username is not None:
+            credentials = f"{urllib.parse.unquote(proxy_parts.username)}:{urllib.parse.unquote(proxy_parts.password or '')}"
+            proxy_headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode()).decode("ascii")
+        if scheme == "https":
+            # TLS runs end to end through a CONNECT tunnel, which carries the proxy credentials
+            connection = http.client.HTTPSConnection(proxy_parts.hostname, proxy_port, timeout=self.timeout)
+            connection.set_tunnel(host, port, headers=proxy_headers)
+            connection.proxy_headers = {}
+        else:
+            # Plain http is forwarded by the proxy: absolute-URI requests with the credentials on each one
+            connection = http.client.HTTPConnection(proxy_parts.hostname, proxy_port, timeout=self.timeout)
+            connection.proxy_headers = proxy_headers
+        connection.absolute_uri = scheme != "https"
+        return connection
+
+    def request(self, method, url, headers=None, max_redirects=5, timeout=None):
+        """Send a request, following up to max_redirects redirects; pass the response to release() once it has been read."""
+        request_headers = {"User-Agent": USER_AGENT}
+        request_headers.update(headers or {})
+        for redirects_left in range(max_redirects, -1, -1):
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+            path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+            absolute_uri = urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path or "/", parts.query, ""))
+            with self.lock:
+                idle_connections = self.idle.get(key)
+                connection = idle_connections.pop() if idle_connections else None
+            reused = connection is not None
+            if connection is None:
+                connection = self.connect(*key)
+            # Requests forwarded by a proxy name the whole URL rather than just the path
+            target = absolute_uri if getattr(connection, "absolute_uri", False) else path
+            # Pooled connections keep whatever timeout suited the previous request, so set it every time
+            connection.timeout = timeout or self.timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(connection.timeout)
+            try:
+                self.send(connection, method, target, request_headers)
+                response = connection.getresponse()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if not reused:
+                    raise
+                # The server closed the idle connection; retry the request once on a fresh one
+                connection = self.connect(*key)
+                connection.timeout = timeout or self.timeout
+                self.send(connection, method, target, request_headers)
+                response = connection.getresponse()
+            response.pool_key = key
+            response.pool_connection = connection
+
+            location = response.getheader("Location")
+            if response.status in (301, 302, 303, 307, 308) and location and redirects_left:
+                response.read()
+                self.release(response)
+                url = urllib.parse.urljoin(url, location)
+                if response.status == 303:
+                    method = "GET"
+                continue
+            return response
+
+    def send(self, connection, method, target, headers):
+        """Send one request, adding any proxy credentials the connection has to carry."""
+        proxy_headers = getattr(connection, "proxy_headers", None)
+        connection.request(method, target, headers={**headers, **proxy_headers} if proxy_headers else headers)
+
+    def release(self, response):
+        """Return a fully read response's connection to the pool, closing it otherwise."""
+        connection = response.pool_connection
+        if response.will_close or not response.isclosed():
+            connection.close()
+            return
+        with self.lock:
+            idle_connections = self.idle.setdefault(response.pool_key, [])
+            if len(idle_connections) < self.max_idle_per_host:
+                idle_connections.append(connection)
+                return
+        connection.close()
+
+# Keep-alive connections reused across SRRs and worker threads
+HTTP_POOL = HTTPConnectionPool()
+
+def stream_download(url, output_path, gzip_fastq_path=None):
+    """Stream a URL into output_path over the shared connection pool, resuming any partial file.
+
+    If gzip_fastq_path is given and a fresh transfer turns out to be plain FASTQ, it is compressed
+    on the fly into gzip_fastq_path instead. Returns the path written, or None on failure.
+    """
+    partial_path = get_partial_path(output_path)
+    offset = size_or_none(partial_path) or 0
+    try:
+        response = HTTP_POOL.request("GET", url, {"Range": f"bytes={offset}-"} if offset else None)
+        try:
+            if response.status == 416:
+                # The partial file is longer than the remote one, so start over next time
+                os.remove(partial_path)
+                return None
+            if response.status not in (200, 206):
+                safe_log("warning", f"  HTTP {response.status} from {url}")
+                return None
+            chunk = response.read(1 << 20)
+            if gzip_fastq_path and response.status == 200 and chunk[:1] == b'@':
+                # Compressing while receiving saves a second full pass over the file; a compressed
+                # partial cannot be resumed, so it is discarded if the transfer does not finish
+                output_path, partial_path = gzip_fastq_path, get_partial_path(gzip_fastq_path)
+                f = gzip.open(partial_path, 'wb', compresslevel=1)
+                resumable = False
+            else:
+                # A 200 to a range request means the server sent the whole file again
+                f = open(partial_path, 'ab' if response.status == 206 else 'wb')
+                resumable = True
+            try:
+                with f:
+                    advise_file(f, "POSIX_FADV_SEQUENTIAL")
+                    while chunk:
+                        if transfer_cancelled():
+                            break
+                        f.write(chunk)
+                        chunk = response.read(1 << 20)
+            finally:
+                if not resumable and chunk:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(partial_path)
+            if chunk:
+                return None
+        finally:
+            HTTP_POOL.release(response)
+    except (http.client.HTTPException, OSError, zlib.error) as e:
+        safe_log("warning", f"  Transfer from {url} interrupted: {e}")
+        return None
+    os.replace(partial_path, output_path)
+    return output_path
+
+def get_ebi_candidates(srr_id):
+    """Return the (label, url_path) EBI locations for an SRR ID in order of preference."""
+    base_url = "https://ftp.sra.ebi.ac.uk/vol1/fastq"
+
+    # Pattern 1: Common EBI SRA pattern with fastq subdirectory hierarchy
+    # Get the first 6 characters of the SRR ID
+    srr_prefix = srr_id[:6]
+    # Calculate additional path components
+    remaining_digits = len(srr_id) - 6
+    if remaining_digits > 0:
+        additional_path = "00" + srr_id[-remaining_digits:] if remaining_digits <= 2 else "0" + srr_id[-3:]
+    else:
+        additional_path = "00"
+    candidates = [("pattern 1", f"{base_url}/{srr_prefix}/{additional_path}/{srr_id}")]
+
+    # Pattern 2: Alternative EBI pattern (directly in fastq directory)
+    candidates.append(("pattern 2", f"{base_url}/{srr_id}"))
+
+    # Pattern 3: ERA pattern for European submissions
+    if srr_id.startswith("ERR"):
+        candidates.append(("ERA pattern", f"https://ftp.sra.ebi.ac.uk/vol1/ERA/{srr_id[:6]}/{srr_id}"))
+    return candidates
+
+def probe_url(url, timeout=30):
+    """Send a HEAD request and return the remote size, 0 if the file is definitely missing, or None if unknown."""
+    try:
+        response = HTTP_POOL.request("HEAD", url, timeout=timeout)
+        response.read()
+        HTTP_POOL.release(response)
+    except (http.client.HTTPException, OSError, ValueError):
+        return None
+    if response.status in (404, 410):
+        return 0
+    # Servers that refuse HEAD (403/405) or omit the length say nothing about whether a GET would work
+    content_length = response.getheader("Content-Length")
+    if response.status != 200 or not content_length or not content_length.isdigit():
+        return None
+    return int(content_length)
+
 def try_download_with_curl(srr_id, out_dir, threads, is_paired):
     """Try to download FASTQ files directly from EBI with curl."""
     try:
@@ -500,227 +1078,83 @@ def try_download_with_curl(srr_id, out_dir, threads, is_paired):
         # Ensure directory is writable
         fix_directory_permissions(fastq_dir)
         
-        # Try different URL patterns for EBI
-        success = False
-        
-        # Pattern 1: Common EBI SRA pattern with fastq subdirectory hierarchy
-        try:
-            # European Nucleotide Archive URL pattern 1
-            base_url = "https://ftp.sra.ebi.ac.uk/vol1/fastq"
-            
-            # Get the first 6 characters of the SRR ID
-            srr_prefix = srr_id[:6]
-            
-            # Calculate additional path components
-            remaining_digits = len(srr_id) - 6
-            if remaining_digits > 0:
-                additional_path = "00" + srr_id[-remaining_digits:] if remaining_digits <= 2 else "0" + srr_id[-3:]
-            else:
-                additional_path = "00"
-            
-            # Construct the URL
-            url_path = f"{base_url}/{srr_prefix}/{additional_path}/{srr_id}"
-            
-            # Download files based on layout
-            if is_paired:
-                file_names = [f"{srr_id}_1.fastq.gz", f"{srr_id}_2.fastq.gz"]
-            else:
-                file_names = [f"{srr_id}.fastq.gz"]
-            
-            # Try to download each file
-            curl_success = True
-            downloaded_files = []
-            
-            for file_name in file_names:
-                url = f"{url_path}/{file_name}"
-                output_path = os.path.join(fastq_dir, file_name)
-                downloaded_files.append(output_path)
-                
-                safe_log("info", f"  Trying to download {file_name} from EBI (pattern 1)...")
-                
-                # Use curl to download the file with timeout and user agent
-                curl_cmd = [
-                    "curl", "-L", "-o", output_path, url, "-f", 
-                    "--connect-timeout", "30", 
-                    "--max-time", "300",
-                    "-A", "Mozilla/5.0 Amalgkit/1.0 (SRA Download Tool; https://github.com/amalgkit; Please contact your@email.com if download issues)"
-                ]
-                curl_process = subprocess.run(
-                    curl_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    check=False
-                )
-                
-                # Check if download was successful
-                if curl_process.returncode != 0 or not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                    safe_log("warning", f"  Curl download failed for {file_name} (pattern 1): {curl_process.returncode}")
-                    curl_success = False
-                    break
-                
-                # Verify it's a valid FASTQ file, not an HTML error page
-                if not is_valid_fastq_file(output_path):
-                    safe_log("warning", f"  Downloaded file is not a valid FASTQ file: {file_name}")
-                    curl_success = False
-                    break
-            
-            if curl_success:
-                # Create marker file only if all files are valid
-                marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
-                with open(marker_file, 'w') as f:
-                    f.write(f"Downloaded and verified on {datetime.now().isoformat()}")
-                safe_log("info", f"  Successfully downloaded from EBI (pattern 1)")
-                return True
-            else:
-                # Clean up any partial downloads
-                for file_path in downloaded_files:
-                    if os.path.exists(file_path):
-                        try:
-                            os.remove(file_path)
-                        except:
-                            pass
-        except Exception as e:
-            safe_log("warning", f"  Error in EBI pattern 1 download: {e}")
+        # Download files based on layout
+        if is_paired:
+            file_names = [f"{srr_id}_1.fastq.gz", f"{srr_id}_2.fastq.gz"]
+        else:
+            file_names = [f"{srr_id}.fastq.gz"]
+        candidates = get_ebi_candidates(srr_id)
+
+        # HEAD every candidate URL at once so missing patterns cost one round trip instead of a failed GET each
+        urls = [f"{url_path}/{file_name}" for _, url_path in candidates for file_name in file_names]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            remote_sizes = dict(zip(urls, executor.map(probe_url, urls)))
+
+        available = []
+        unprobed = []
+        for label, url_path in candidates:
+            sizes = [remote_sizes[f"{url_path}/{file_name}"] for file_name in file_names]
+            if all(size is not None and size > 1024 for size in sizes):
+                available.append((label, url_path))
+            elif all(size is None or size > 1024 for size in sizes):
+                # HEAD did not get through (e.g. a proxy rejecting it), so fall back to trying the GET
+                unprobed.append((label, url_path))
         
-        # Pattern 2: Alternative EBI pattern (directly in fastq directory)
-        try:
-            # European Nucleotide Archive URL pattern 2
-            base_url = "https://ftp.sra.ebi.ac.uk/vol1/fastq"
-            url_path = f"{base_url}/{srr_id}"
-            
-            # Download files based on layout
-            if is_paired:
-                file_names = [f"{srr_id}_1.fastq.gz", f"{srr_id}_2.fastq.gz"]
-            else:
-                file_names = [f"{srr_id}.fastq.gz"]
-            
-            # Try to download each file
-            curl_success = True
-            downloaded_files = []
-            
-            for file_name in file_names:
-                url = f"{url_path}/{file_name}"
-                output_path = os.path.join(fastq_dir, file_name)
-                downloaded_files.append(output_path)
-                
-                safe_log("info", f"  Trying to download {file_name} from EBI (pattern 2)...")
-                
-                # Use curl to download the file with timeout and user agent
-                curl_cmd = [
-                    "curl", "-L", "-o", output_path, url, "-f", 
-                    "--connect-timeout", "30", 
-                    "--max-time", "300",
-                    "-A", "Mozilla/5.0 Amalgkit/1.0 (SRA Download Tool; https://github.com/amalgkit; Please contact your@email.com if download issues)"
-                ]
-                curl_process = subprocess.run(
-                    curl_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    check=False
-                )
-                
-                # Check if download was successful
-                if curl_process.returncode != 0 or not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                    safe_log("warning", f"  Curl download failed for {file_name} (pattern 2): {curl_process.returncode}")
-                    curl_success = False
-                    break
+        # Unknown sizes are still worth a GET, after the candidates HEAD confirmed
+        for label, url_path in available + unprobed:
+            try:
+                downloaded_files = [os.path.join(fastq_dir, file_name) for file_name in file_names]
+                safe_log("info", f"  Trying to download {', '.join(file_names)} from EBI ({label})...")
                 
-                # Verify it's a valid FASTQ file, not an HTML error page
-                if not is_valid_fastq_file(output_path):
-                    safe_log("warning", f"  Downloaded file is not a valid FASTQ file: {file_name}")
-                    curl_success = False
-                    break
-            
-            if curl_success:
-                # Create marker file only if all files are valid
-                marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
-                with open(marker_file, 'w') as f:
-                    f.write(f"Downloaded and verified on {datetime.now().isoformat()}")
-                safe_log("info", f"  Successfully downloaded from EBI (pattern 2)")
-                return True
-            else:
-                # Clean up any partial downloads
-                for file_path in downloaded_files:
-                    if os.path.exists(file_path):
-                        try:
-                            os.remove(file_path)
-                        except:
-                            pass
-        except Exception as e:
-            safe_log("warning", f"  Error in EBI pattern 2 download: {e}")
-        
-        # Pattern 3: ERA pattern for European submissions
-        try:
-            # European Nucleotide Archive URL pattern 3 (ERA)
-            base_url = "https://ftp.sra.ebi.ac.uk/vol1/ERA"
-            # For ERA, we need different path construction
-            if srr_id.startswith("ERR"):
-                era_prefix = srr_id[:6]
-                era_path = f"{base_url}/{era_prefix}/{srr_id}"
+                # Files already on disk at the size advertised by HEAD need no GET; shorter ones are resumed
+                pending = []
+                for file_name, output_path in zip(file_names, downloaded_files):
+                    remote_size = remote_sizes[f"{url_path}/{file_name}"]
+                    if remote_size and size_or_none(output_path) == remote_size:
+                        safe_log("info", f"  {file_name} already matches the remote size, skipping download")
+                    else:
+                        pending.append((file_name, output_path))
                 
-                # Download files based on layout
-                if is_paired:
-                    file_names = [f"{srr_id}_1.fastq.gz", f"{srr_id}_2.fastq.gz"]
-                else:
-                    file_names = [f"{srr_id}.fastq.gz"]
+                fetch_results = {}
+                if pending:
+                    pending_urls = [(f"{url_path}/{file_name}", output_path) for file_name, output_path in pending]
+                    expected_sizes = {output_path: remote_sizes[url] for url, output_path in pending_urls}
+                    with HOST_SEMAPHORES["ebi"]:
+                        if has_tool("aria2c"):
+                            fetch_results = fetch_with_aria2c(pending_urls, expected_sizes)
+                            # Retry anything aria2c could not fetch with curl, resuming its partial file
+                            failed_urls = [(url, output_path) for url, output_path in pending_urls
+                                           if not fetch_results[output_path]]
+                            if failed_urls and not transfer_cancelled():
+                                safe_log("info", f"  aria2c failed for {len(failed_urls)} file(s), retrying with curl")
+                                fetch_results.update(fetch_with_curl(failed_urls, expected_sizes=expected_sizes))
+                        else:
+                            fetch_results = fetch_with_curl(pending_urls, expected_sizes=expected_sizes)
                 
-                # Try to download each file
                 curl_success = True
-                downloaded_files = []
-                
-                for file_name in file_names:
-                    url = f"{era_path}/{file_name}"
-                    output_path = os.path.join(fastq_dir, file_name)
-                    downloaded_files.append(output_path)
-                    
-                    safe_log("info", f"  Trying to download {file_name} from EBI (ERA pattern)...")
-                    
-                    # Use curl to download the file with timeout and user agent
-                    curl_cmd = [
-                        "curl", "-L", "-o", output_path, url, "-f", 
-                        "--connect-timeout", "30", 
-                        "--max-time", "300",
-                        "-A", "Mozilla/5.0 Amalgkit/1.0 (SRA Download Tool; https://github.com/amalgkit; Please contact your@email.com if download issues)"
-                    ]
-                    curl_process = subprocess.run(
-                        curl_cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        text=True,
-                        check=False
-                    )
-                    
+                for file_name, output_path in zip(file_names, downloaded_files):
                     # Check if download was successful
-                    if curl_process.returncode != 0 or not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                        safe_log("warning", f"  Curl download failed for {file_name} (ERA pattern): {curl_process.returncode}")
+                    if not fetch_results.get(output_path, True) or size_or_none(output_path) is None:
+                        safe_log("warning", f"  Curl download failed for {file_name} ({label})")
                         curl_success = False
                         break
                     
                     # Verify it's a valid FASTQ file, not an HTML error page
                     if not is_valid_fastq_file(output_path):
                         safe_log("warning", f"  Downloaded file is not a valid FASTQ file: {file_name}")
+                        with contextlib.suppress(FileNotFoundError):
+                            os.unlink(output_path)
                         curl_success = False
                         break
                 
                 if curl_success:
                     # Create marker file only if all files are valid
-                    marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
-                    with open(marker_file, 'w') as f:
-                        f.write(f"Downloaded and verified on {datetime.now().isoformat()}")
-                    safe_log("info", f"  Successfully downloaded from EBI (ERA pattern)")
+                    mark_done(fastq_dir, srr_id)
+                    safe_log("info", f"  Successfully downloaded from EBI ({label})")
                     return True
-                else:
-                    # Clean up any partial downloads
-                    for file_path in downloaded_files:
-                        if os.path.exists(file_path):
-                            try:
-                                os.remove(file_path)
-                            except:
-                                pass
-        except Exception as e:
-            safe_log("warning", f"  Error in EBI ERA pattern download: {e}")
+                # Interrupted transfers stay behind as .part files, so the next attempt resumes them
+            except Exception as e:
+                safe_log("warning", f"  Error in EBI {label} download: {e}")
         
         # If we got here, all patterns failed
         safe_log("warning", f"  All EBI download patterns failed for {srr_id}")
@@ -730,6 +1164,83 @@ def try_download_with_curl(srr_id, out_dir, threads, is_paired):
         safe_log("warning", f"Error in curl download: {e}")
         return False
 
+def bulk_download_from_ebi(srr_ids, out_dir, layout_map, force=False, existing_dirs=None):
+    """Fetch the primary EBI location of many SRRs with a few large curl batches, returning the IDs that completed."""
+    if not has_tool("curl") or get_curl_info()[0] < (7, 66):
+        # Without --parallel one curl would fetch everything serially; the worker pool does better
+        return set()
+    
+    files_by_srr = {}
+    urls_by_srr = {}
+    for srr_id in srr_ids:
+        is_paired = get_layout(layout_map, srr_id)
+        # Runs of unknown layout or already on disk are left to the per-SRR path
+        has_dir = existing_dirs is None or srr_id in existing_dirs
+        if is_paired is None or (not force and has_dir and check_existing_files(srr_id, out_dir, paired=is_paired)):
+            continue
+        fastq_dir = os.path.join(out_dir, srr_id)
+        # Files are fetched into the EBI staging directory of the per-SRR path, so whatever this pass
+        # leaves unfinished is resumed there rather than downloaded again
+        staging_dir = os.path.join(get_staging_dir(fastq_dir, "EBI"), srr_id)
+        os.makedirs(staging_dir, exist_ok=True)
+        fix_directory_permissions(fastq_dir)
+        file_names = [f"{srr_id}_1.fastq.gz", f"{srr_id}_2.fastq.gz"] if is_paired else [f"{srr_id}.fastq.gz"]
+        url_path = get_ebi_candidates(srr_id)[0][1]
+        files_by_srr[srr_id] = [os.path.join(staging_dir, file_name) for file_name in file_names]
+        urls_by_srr[srr_id] = [f"{url_path}/{file_name}" for file_name in file_names]
+    if not files_by_srr:
+        return set()
+    
+    safe_log("info", f"⬇️  Bulk downloading {sum(map(len, files_by_srr.values()))} file(s) for "
+             f"{len(files_by_srr)} SRA entries from EBI...")
+    start_time = time.time()
+    
+    # A batch keeps every connection busy while staying short enough to report progress regularly
+    batch_size = HOST_CONNECTION_LIMITS["ebi"] * BULK_BATCH_FACTOR
+    pending_srrs = list(files_by_srr)
+    completed = set()
+    for batch_start in range(0, len(pending_srrs), batch_size):
+        if shutdown_event.is_set():
+            break
+        batch = pending_srrs[batch_start:batch_start + batch_size]
+        downloads = [(url, output_path) for srr_id in batch
+                     for url, output_path in zip(urls_by_srr[srr_id], files_by_srr[srr_id])]
+        # A failing batch or SRR is only logged: whatever this pass does not deliver is left to the
+        # worker pool and its NCBI/fastq-dump fallbacks instead of aborting the run
+        try:
+            fetch_results = fetch_with_curl(downloads, parallel_max=HOST_CONNECTION_LIMITS["ebi"])
+        except Exception as e:
+            safe_log("warning", f"  Bulk EBI batch of {len(batch)} SRA entries failed: {e}")
+            fetch_results = {}
+        
+        for srr_id in batch:
+            output_paths = files_by_srr[srr_id]
+            if not all(fetch_results.get(output_path) for output_path in output_paths):
+                continue
+            try:
+                if not all(is_valid_fastq_file(output_path) for output_path in output_paths):
+                    for output_path in output_paths:
+                        with contextlib.suppress(FileNotFoundError):
+                            os.unlink(output_path)
+                    continue
+                fastq_dir = os.path.join(out_dir, srr_id)
+                for output_path in output_paths:
+                    os.replace(output_path, os.path.join(fastq_dir, os.path.basename(output_path)))
+                remove_staging_dirs(fastq_dir)
+                mark_done(fastq_dir, srr_id)
+                completed.add(srr_id)
+            except Exception as e:
+                safe_log("warning", f"  Could not finish bulk EBI download of {srr_id}: {e}")
+        
+        done_count = min(batch_start + batch_size, len(pending_srrs))
+        safe_log("info", f"  Bulk EBI progress: {done_count}/{len(pending_srrs)} SRA entries attempted, "
+                 f"{len(completed)} completed ({time.time() - start_time:.1f} seconds)")
+    
+    elapsed_time = time.time() - start_time
+    safe_log("info", f"✅ Bulk EBI download completed {len(completed)}/{len(files_by_srr)} SRA entries "
+             f"in {elapsed_time:.1f} seconds; the rest fall back to per-SRR downloads")
+    return completed
+
 def download_with_fastq_dump(srr_id, out_dir, threads):
     """Use fastq-dump as a last resort."""
     try:
@@ -744,36 +1255,24 @@ def download_with_fastq_dump(srr_id, out_dir, threads):
         
         # First, try with --split-files for paired-end data
         fastq_dump_cmd = [
-            "fastq-dump", srr_id,
+            resolve_tool("fastq-dump"), srr_id,
             "--outdir", fastq_dir,
             "--gzip",
             "--split-files"
         ]
         
-        process = subprocess.run(
-            fastq_dump_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            check=False
-        )
+        process = run_transfer_command(fastq_dump_cmd, stderr=subprocess.STDOUT)
         
         # If --split-files failed, try without it for single-end data
         if process.returncode != 0:
             safe_log("info", f"  Split-files fastq-dump failed, trying single-end...")
             fastq_dump_cmd = [
-                "fastq-dump", srr_id,
+                resolve_tool("fastq-dump"), srr_id,
                 "--outdir", fastq_dir,
                 "--gzip"
             ]
             
-            process = subprocess.run(
-                fastq_dump_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                check=False
-            )
+            process = run_transfer_command(fastq_dump_cmd, stderr=subprocess.STDOUT)
         
         # Check if download was successful by looking for files
         if process.returncode == 0:
@@ -783,9 +1282,7 @@ def download_with_fastq_dump(srr_id, out_dir, threads):
                 safe_log("info", f"  fastq-dump successful, created files: {files}")
                 
                 # Create marker file
-                marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
-                with open(marker_file, 'w') as f:
-                    f.write(f"Downloaded and verified on {datetime.now().isoformat()}")
+                mark_done(fastq_dir, srr_id)
                 
                 return True
         
@@ -814,24 +1311,23 @@ def try_ncbi_download(srr_id, out_dir, threads, is_paired):
             
             safe_log("info", f"  Trying to download {srr_id} from NCBI (pattern 1)...")
             
-            # Download to a temporary file
+            # Download to a temporary file; single-end FASTQ is instead gzipped as it arrives
             temp_file = os.path.join(fastq_dir, f"{srr_id}.temp")
-            curl_cmd = [
-                "curl", "-L", "-o", temp_file, url, "-f", 
-                "--connect-timeout", "30", 
-                "--max-time", "600",
-                "-A", "Mozilla/5.0 Amalgkit/1.0 (SRA Download Tool; https://github.com/amalgkit; Please contact your@email.com if download issues)"
-            ]
-            curl_process = subprocess.run(
-                curl_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                check=False
-            )
+            fastq_gz_file = os.path.join(fastq_dir, f"{srr_id}.fastq.gz")
+            # An interrupted transfer is kept as a partial file and resumed on the next attempt
+            with HOST_SEMAPHORES["ncbi"]:
+                downloaded = stream_download(url, temp_file, gzip_fastq_path=None if is_paired else fastq_gz_file)
             
-            # Check if download was successful
-            if curl_process.returncode == 0 and os.path.exists(temp_file) and os.path.getsize(temp_file) > 1024:
+            if downloaded == fastq_gz_file:
+                # Nothing left to unpack or compress
+                if verify_and_clean_downloads(fastq_dir, srr_id, is_paired):
+                    mark_done(fastq_dir, srr_id)
+                    safe_log("info", f"  Successfully downloaded and compressed FASTQ from NCBI (pattern 1)")
+                    return True
+                downloaded = None
+            
+            # Check if download was successful (a mirror that lost the race skips the unpacking)
+            if downloaded and (size_or_none(temp_file) or 0) > 1024 and not transfer_cancelled():
                 # Process the downloaded file (might be a zip or tar archive)
                 # Try to extract if it's an archive
                 extract_success = False
@@ -873,8 +1369,8 @@ def try_ncbi_download(srr_id, out_dir, threads, is_paired):
                             os.rename(temp_file, fastq_file)
                             
                             # Compress it
-                            gzip_cmd = ["gzip", fastq_file]
-                            subprocess.run(gzip_cmd, check=False)
+                            gzip_cmd = [resolve_tool("gzip"), fastq_file]
+                            run_transfer_command(gzip_cmd)
                             safe_log("info", f"  Successfully processed direct FASTQ file")
                             extract_success = True
                     else:
@@ -882,24 +1378,25 @@ def try_ncbi_download(srr_id, out_dir, threads, is_paired):
                         os.remove(temp_file)
                 
                 # Clean up temporary file if it still exists
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(temp_file)
                 
                 # Verify files are valid FASTQ
                 if extract_success and verify_and_clean_downloads(fastq_dir, srr_id, is_paired):
-                    marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
-                    with open(marker_file, 'w') as f:
-                        f.write(f"Downloaded and verified on {datetime.now().isoformat()}")
+                    mark_done(fastq_dir, srr_id)
                     safe_log("info", f"  Successfully downloaded from NCBI (pattern 1)")
                     return True
             else:
                 # Clean up failed download
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                safe_log("warning", f"  NCBI pattern 1 download failed: {curl_process.returncode}")
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(temp_file)
+                safe_log("warning", f"  NCBI pattern 1 download failed")
         except Exception as e:
             safe_log("warning", f"  Error in NCBI pattern 1 download: {e}")
         
+        if transfer_cancelled():
+            return False
+        
         # Pattern 2: NCBI sra-pub-run direct download
         try:
             base_url = "https://sra-pub-run-odp.s3.amazonaws.com/sra"
@@ -909,32 +1406,22 @@ def try_ncbi_download(srr_id, out_dir, threads, is_paired):
             
             # Download to a temporary file
             temp_file = os.path.join(fastq_dir, f"{srr_id}.sra")
-            curl_cmd = [
-                "curl", "-L", "-o", temp_file, url, "-f", 
-                "--connect-timeout", "30", 
-                "--max-time", "600",
-                "-A", "Mozilla/5.0 Amalgkit/1.0 (SRA Download Tool; https://github.com/amalgkit; Please contact your@email.com if download issues)"
-            ]
-            curl_process = subprocess.run(
-                curl_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                check=False
-            )
+            # An interrupted transfer is kept as a partial file and resumed on the next attempt
+            with HOST_SEMAPHORES["ncbi"]:
+                downloaded = stream_download(url, temp_file)
             
             # Check if download was successful
-            if curl_process.returncode == 0 and os.path.exists(temp_file) and os.path.getsize(temp_file) > 1024:
+            if downloaded and (size_or_none(temp_file) or 0) > 1024:
                 # Now use fastq-dump to extract the SRA file if available
                 try:
                     # Check if fastq-dump is available
-                    fastq_dump_cmd = ["which", "fastq-dump"]
-                    subprocess.run(fastq_dump_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                    if not has_tool("fastq-dump"):
+                        raise FileNotFoundError("fastq-dump not found on PATH")
                     
                     # Extract with fastq-dump
                     safe_log("info", f"  Converting SRA to FASTQ with fastq-dump...")
                     extract_cmd = [
-                        "fastq-dump",
+                        resolve_tool("fastq-dump"),
                         "--outdir", fastq_dir,
                         "--gzip",
                         "--split-files" if is_paired else "",
@@ -942,24 +1429,16 @@ def try_ncbi_download(srr_id, out_dir, threads, is_paired):
                     ]
                     extract_cmd = [cmd for cmd in extract_cmd if cmd]  # Remove empty elements
                     
-                    extract_process = subprocess.run(
-                        extract_cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        text=True,
-                        check=False
-                    )
+                    extract_process = run_transfer_command(extract_cmd, stderr=subprocess.STDOUT)
                     
                     if extract_process.returncode == 0:
                         # Verify the extracted files
                         if verify_and_clean_downloads(fastq_dir, srr_id, is_paired):
-                            marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
-                            with open(marker_file, 'w') as f:
-                                f.write(f"Downloaded and verified on {datetime.now().isoformat()}")
+                            mark_done(fastq_dir, srr_id)
                             safe_log("info", f"  Successfully downloaded from NCBI S3 (pattern 2)")
                             # Clean up SRA file
-                            if os.path.exists(temp_file):
-                                os.remove(temp_file)
+                            with contextlib.suppress(FileNotFoundError):
+                                os.unlink(temp_file)
                             return True
                     else:
                         safe_log("warning", f"  fastq-dump extraction failed: {extract_process.returncode}")
@@ -968,14 +1447,15 @@ def try_ncbi_download(srr_id, out_dir, threads, is_paired):
                 
                 # If extraction failed or fastq-dump not available, keep the SRA file
                 # but report as failure since we couldn't convert to FASTQ
-                if os.path.exists(temp_file):
+                if size_or_none(temp_file) is not None:
                     safe_log("warning", f"  Downloaded SRA file but couldn't convert to FASTQ")
-                    os.remove(temp_file)
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(temp_file)
             else:
                 # Clean up failed download
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                safe_log("warning", f"  NCBI S3 pattern 2 download failed: {curl_process.returncode}")
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(temp_file)
+                safe_log("warning", f"  NCBI S3 pattern 2 download failed")
         except Exception as e:
             safe_log("warning", f"  Error in NCBI S3 pattern 2 download: {e}")
         
@@ -986,11 +1466,103 @@ def try_ncbi_download(srr_id, out_dir, threads, is_paired):
     except Exception as e:
         safe_log("warning", f"Error in NCBI download: {e}")
         temp_file = os.path.join(fastq_dir, f"{srr_id}.temp")
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_file)
         return False
 
-def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
+def get_fresh_mirror_states(mirror):
+    """Return the unexpired probe results for the endpoints of a mirror (e.g. "EBI")."""
+    now = time.monotonic()
+    with mirror_state_lock:
+        return [state for name, state in MIRROR_STATE.items()
+                if name.startswith(f"{mirror}_") and now - state["t"] < MIRROR_STATE_TTL]
+
+def order_mirrors(mirrors):
+    """Sort (name, function) mirrors fastest first, moving ones recently found unreachable to the end."""
+    ranked = []
+    for position, (name, download_function) in enumerate(mirrors):
+        states = get_fresh_mirror_states(name)
+        # Any HTTP answer shows the host is up, even an error status from the base URL that was probed;
+        # only connection failures push a mirror back, and no mirror is ever left out of the race
+        unreachable = bool(states) and not any(state["reachable"] for state in states)
+        rtt = min((state["rtt"] for state in states if state["reachable"]), default=float("inf"))
+        ranked.append((unreachable, rtt, position, name, download_function))
+    ranked.sort(key=lambda item: item[:3])
+    return [(name, download_function) for _, _, _, name, download_function in ranked]
+
+def run_mirror_download(download_function, srr_id, staging_dir, threads, is_paired, cancel_event):
+    """Run one mirror's download into its own staging directory until it finishes or is cancelled."""
+    transfer_state.cancel_event = cancel_event
+    try:
+        return download_function(srr_id, staging_dir, threads, is_paired)
+    finally:
+        transfer_state.cancel_event = None
+        # A mirror that lost the race discards its own files once it has stopped writing them
+        if cancel_event.is_set() and not shutdown_event.is_set():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+def get_staging_dir(fastq_dir, mirror):
+    """Return the directory a mirror (e.g. "EBI") downloads an SRR into before it is moved into fastq_dir."""
+    return os.path.join(fastq_dir, f"{STAGING_PREFIX}{mirror.lower()}")
+
+def remove_staging_dirs(fastq_dir):
+    """Delete the mirror-race staging directories left in an SRR's directory by earlier attempts."""
+    for name, entry in scan_directory(fastq_dir).items():
+        if name.startswith(STAGING_PREFIX) and entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+def race_mirror_downloads(srr_id, out_dir, threads, is_paired):
+    """Download from EBI and NCBI at the same time and keep whichever finishes first."""
+    fastq_dir = os.path.join(out_dir, srr_id)
+    mirrors = order_mirrors([("EBI", try_download_with_curl), ("NCBI", try_ncbi_download)])
+    # Each mirror writes into its own directory so the racers never touch each other's files
+    staging_dirs = {name: get_staging_dir(fastq_dir, name) for name, _ in mirrors}
+    cancel_event = threading.Event()
+    start_time = time.time()
+    
+    winner = None
+    future_to_mirror = {}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(mirrors))
+    try:
+        future_to_mirror = {
+            executor.submit(run_mirror_download, download_function, srr_id, staging_dirs[name],
+                            threads, is_paired, cancel_event): name
+            for name, download_function in mirrors
+        }
+        pending = set(future_to_mirror)
+        while pending and winner is None:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    success = future.result()
+                except Exception as e:
+                    safe_log("info", f"{future_to_mirror[future]} download failed: {e}")
+                    success = False
+                if success and winner is None:
+                    winner = future_to_mirror[future]
+    finally:
+        # Stop the losing mirror without waiting for it: its child processes are killed, streaming
+        # stops at the next chunk, and it removes its own staging directory once it has stopped
+        cancel_event.set()
+        executor.shutdown(wait=False)
+    
+    if winner is None:
+        # Both failed; partial files stay in the staging directories, where the next race resumes them
+        return False
+    
+    winner_dir = os.path.join(staging_dirs[winner], srr_id)
+    for entry in scan_directory(winner_dir).values():
+        os.replace(entry.path, os.path.join(fastq_dir, entry.name))
+    for future, name in future_to_mirror.items():
+        # A loser that already returned will not clean up after itself
+        if name == winner or future.done():
+            shutil.rmtree(staging_dirs[name], ignore_errors=True)
+    
+    elapsed_time = time.time() - start_time
+    safe_log("info", f"✅ {srr_id}: {winner} download successful in {elapsed_time:.1f} seconds")
+    return True
+
+def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file, layout_map):
     """Download a single SRR entry using amalgkit, with improved logging."""
     fastq_dir = os.path.join(out_dir, srr_id)
     os.makedirs(fastq_dir, exist_ok=True)
@@ -998,12 +1570,10 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
     # Ensure directory is writable
     fix_directory_permissions(fastq_dir)
     
-    # Get workspace root directory
-    workspace_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
-    bin_dir = os.path.join(workspace_root, 'bin')
+    bin_dir = os.path.join(WORKSPACE_ROOT, 'bin')
     
     # Check layout from metadata
-    is_paired = get_layout_from_metadata(metadata_file, srr_id)
+    is_paired = get_layout(layout_map, srr_id)
     layout_str = 'paired' if is_paired else 'single' if is_paired is not None else 'unknown'
     safe_log("info", f"Processing {srr_id} (Layout: {layout_str})")
     
@@ -1012,10 +1582,15 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
         safe_log("info", f"✓ {srr_id}: FASTQ files already exist, skipping download")
         return True
     
+    # Once the run is interrupted no further download stage is started
+    if shutdown_event.is_set():
+        return False
+    
     # Try direct SRA toolkit download if prefetch and fasterq-dump are available
     try:
         # Check if prefetch is available
-        subprocess.run(["which", "prefetch"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if not has_tool("prefetch"):
+            raise FileNotFoundError("prefetch not found on PATH")
         
         safe_log("info", f"⬇️  Downloading {srr_id} with direct SRA toolkit...")
         start_time = time.time()
@@ -1028,31 +1603,19 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
     except Exception as e:
         safe_log("info", f"Direct SRA toolkit not available: {e}")
     
-    # Try downloading with curl from EBI
-    try:
-        safe_log("info", f"⬇️  Trying to download {srr_id} from EBI...")
-        start_time = time.time()
-        success = try_download_with_curl(srr_id, out_dir, threads, is_paired)
-        
-        if success:
-            elapsed_time = time.time() - start_time
-            safe_log("info", f"✅ {srr_id}: EBI download successful in {elapsed_time:.1f} seconds")
-            return True
-    except Exception as e:
-        safe_log("info", f"EBI download failed: {e}")
+    if shutdown_event.is_set():
+        return False
     
-    # Try downloading from NCBI directly
+    # Race EBI and NCBI so that a slow or dead mirror does not hold up the other
     try:
-        safe_log("info", f"⬇️  Trying to download {srr_id} from NCBI...")
-        start_time = time.time()
-        success = try_ncbi_download(srr_id, out_dir, threads, is_paired)
-        
-        if success:
-            elapsed_time = time.time() - start_time
-            safe_log("info", f"✅ {srr_id}: NCBI download successful in {elapsed_time:.1f} seconds")
+        safe_log("info", f"⬇️  Trying to download {srr_id} from EBI and NCBI...")
+        if race_mirror_downloads(srr_id, out_dir, threads, is_paired):
             return True
     except Exception as e:
-        safe_log("info", f"NCBI download failed: {e}")
+        safe_log("info", f"EBI/NCBI download failed: {e}")
+    
+    if shutdown_event.is_set():
+        return False
     
     # If all else fails, try amalgkit
     safe_log("info", f"⬇️  Downloading {srr_id} with amalgkit...")
@@ -1070,7 +1633,7 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
     
     # Use amalgkit getfastq with different parameters
     cmd = [
-        amalgkit_path, "getfastq",
+        resolve_tool(amalgkit_path), "getfastq",
         "--id_list", temp_id_file,
         "--out_dir", out_dir,
         "--threads", str(threads),
@@ -1086,23 +1649,17 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
             cmd, 
             stdout=subprocess.PIPE, 
             stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
+            bufsize=1 << 16,
             env=env  # Use the modified environment with bin in PATH
         )
+        # amalgkit can run for a long time, so a Ctrl-C kills it rather than waiting for it to finish
+        threading.Thread(target=kill_on_shutdown, args=(process,), daemon=True).start()
         
         # Filter and display important messages only
-        for line in process.stdout:
+        # (one 64 KB buffered reader, decoded once; undecodable bytes never abort the download)
+        for line in io.TextIOWrapper(process.stdout, encoding='utf-8', errors='replace'):
             line = line.strip()
-            if any(pattern in line for pattern in [
-                "Total bases:", 
-                "Downloading SRA", 
-                "Time elapsed", 
-                "Library layout",
-                "ERROR", 
-                "Warning",
-                "Exception"
-            ]):
+            if AMALGKIT_LOG_RE.search(line):
                 safe_log("info", f"  {line}")
         
         process.wait()
@@ -1116,20 +1673,20 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
             potential_directories = [
                 fastq_dir,
                 os.path.join(out_dir, "getfastq", srr_id),  # Some amalgkit versions put files here
-                os.path.join(workspace_root, "data", "fastq", srr_id),
-                os.path.join(workspace_root, "data", "getfastq", srr_id),
+                os.path.join(WORKSPACE_ROOT, "data", "fastq", srr_id),
+                os.path.join(WORKSPACE_ROOT, "data", "getfastq", srr_id),
             ]
             
             for check_dir in potential_directories:
-                if os.path.exists(check_dir):
+                # A single scandir both tests for the directory and lists it
+                entries = scan_directory(check_dir)
+                if entries:
                     safe_log("info", f"  Checking directory: {check_dir}")
-                    
-                    # List files in the output directory
-                    files = os.listdir(check_dir)
-                    safe_log("info", f"  Files in {check_dir}: {files}")
+                    safe_log("info", f"  Files in {check_dir}: {list(entries)}")
                     
                     # Look for fastq files with any extension/pattern
-                    fastq_files = [f for f in files if f.endswith(('.fastq.gz', '.fastq', '.fq.gz', '.fq'))]
+                    fastq_files = [name for name, entry in entries.items()
+                                   if name.endswith(SINGLE_SUFFIXES) and entry.is_file(follow_symlinks=False)]
                     if fastq_files:
                         safe_log("info", f"  Found FASTQ files: {fastq_files}")
                         
@@ -1140,12 +1697,10 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
                                 src = os.path.join(check_dir, file)
                                 dst = os.path.join(fastq_dir, file)
                                 safe_log("info", f"  Moving {src} to {dst}")
-                                shutil.move(src, dst)
+                                fast_move(src, dst)
                         
                         # Create marker file
-                        marker_file = os.path.join(fastq_dir, f"{srr_id}.completed")
-                        with open(marker_file, 'w') as f:
-                            f.write(f"Downloaded and verified on {datetime.now().isoformat()}")
+                        mark_done(fastq_dir, srr_id)
                         
                         # Verify files are valid FASTQ
                         if verify_and_clean_downloads(fastq_dir, srr_id, is_paired):
@@ -1155,6 +1710,9 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
             # If we get here, no valid files were found in any directory
             safe_log("warning", f"❌ {srr_id}: Download completed but no valid FASTQ files found")
             
+            if shutdown_event.is_set():
+                return False
+            
             # Try fastq-dump as a last resort
             safe_log("info", f"  Amalgkit failed, trying fastq-dump as last resort...")
             if download_with_fastq_dump(srr_id, out_dir, threads):
@@ -1165,6 +1723,8 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
             return False
         else:
             safe_log("error", f"❌ {srr_id}: Download failed with return code {process.returncode}")
+            if shutdown_event.is_set():
+                return False
             
             # If amalgkit failed, try fastq-dump as a last resort
             safe_log("info", f"  Amalgkit failed, trying fastq-dump as last resort...")
@@ -1178,16 +1738,15 @@ def download_single_sra(srr_id, out_dir, threads, amalgkit_path, metadata_file):
         return False
     finally:
         # Clean up temp file
-        if os.path.exists(temp_id_file):
-            try:
-                os.remove(temp_id_file)
-            except:
-                pass
+        with contextlib.suppress(OSError):
+            os.unlink(temp_id_file)
 
-def download_worker(srr_id, out_dir, threads, amalgkit_path, metadata_file, force=False):
+def download_worker(srr_id, out_dir, threads, amalgkit_path, metadata_file, layout_map, force=False, existing_dirs=None):
     """Worker function for threaded downloads."""
-    # Check if files already exist (without force flag)
-    if not force and check_existing_files(srr_id, out_dir):
+    # Check if files already exist (without force flag), against the run's layout from the shared metadata map;
+    # runs with no directory in the startup listing of out_dir cannot have files yet
+    has_dir = existing_dirs is None or srr_id in existing_dirs
+    if not force and has_dir and check_existing_files(srr_id, out_dir, paired=get_layout(layout_map, srr_id)):
         safe_log("info", f"✓ {srr_id}: FASTQ files already exist, skipping")
         return (srr_id, "skipped")
     
@@ -1197,57 +1756,61 @@ def download_worker(srr_id, out_dir, threads, amalgkit_path, metadata_file, forc
         out_dir, 
         threads, 
         amalgkit_path,
-        metadata_file
+        metadata_file,
+        layout_map
     )
     
     if success:
+        # Partial files from earlier mirror races are no use once the run is on disk
+        remove_staging_dirs(os.path.join(out_dir, srr_id))
         return (srr_id, "success")
     else:
         return (srr_id, "failed")
 
 def display_emoji_progress_bar(completed, total, successful, skipped, failed, elapsed_time):
     """Display a beautiful emoji progress bar."""
-    with progress_lock:
-        # Calculate percentage and remaining time
-        progress_pct = (completed / total) * 100 if total > 0 else 0
-        estimated_total = (elapsed_time / completed) * total if completed > 0 else 0
-        remaining_time = max(0, estimated_total - elapsed_time) if estimated_total > 0 else 0
-        
-        # Determine bar width based on terminal size (leave room for text)
-        text_space = 40  # Space for text indicators
-        bar_width = max(10, terminal_width - text_space)
-        
-        # Create the progress bar
-        filled_length = int(bar_width * completed // total)
-        empty_length = bar_width - filled_length
-        
-        # Choose progress bar characters based on success/fail ratio
-        if completed == 0:
-            bar_char = "🔷"
-        elif failed > (completed * 0.5):
-            bar_char = "🔴"  # Mostly failures
-        elif failed > 0:
-            bar_char = "🟠"  # Some failures
-        else:
-            bar_char = "🟢"  # All successful/skipped
-            
-        # Build the bar
-        bar = bar_char * filled_length + "⬜" * empty_length
-        
-        # Status icons
-        success_icon = "✅"
-        skipped_icon = "⏭️"
-        failed_icon = "❌"
-        time_icon = "⏱️"
-        
-        # Print the complete progress bar
-        print(f"\r{bar} {progress_pct:5.1f}% | " +
-              f"{success_icon}{successful} {skipped_icon}{skipped} {failed_icon}{failed} | " +
-              f"{time_icon} {remaining_time/60:.1f}m left", end="")
+    global last_progress_draw
+    # Redraw at most 10 times a second, but always draw the final state
+    now = time.monotonic()
+    if now - last_progress_draw < PROGRESS_REDRAW_INTERVAL and completed < total:
+        return
+    last_progress_draw = now
+    
+    # Calculate percentage and remaining time
+    progress_pct = (completed / total) * 100 if total > 0 else 0
+    estimated_total = (elapsed_time / completed) * total if completed > 0 else 0
+    remaining_time = max(0, estimated_total - elapsed_time) if estimated_total > 0 else 0
+    
+    # Determine bar width based on terminal size (leave room for text)
+    text_space = 40  # Space for text indicators
+    bar_width = max(10, terminal_width - text_space)
+    
+    # Create the progress bar
+    filled_length = int(bar_width * completed // total) if total > 0 else 0
+    empty_length = bar_width - filled_length
+    
+    # Choose progress bar characters based on success/fail ratio
+    if completed == 0:
+        bar_char = "🔷"
+    elif failed > (completed * 0.5):
+        bar_char = "🔴"  # Mostly failures
+    elif failed > 0:
+        bar_char = "🟠"  # Some failures
+    else:
+        bar_char = "🟢"  # All successful/skipped
         
-        # Add a newline if complete
-        if completed >= total:
-            print()
+    # Build the complete line outside the lock; only the write itself is serialised
+    bar = bar_char * filled_length + "⬜" * empty_length
+    line = (f"\r{bar} {progress_pct:5.1f}% | "
+            f"{SUCCESS_ICON}{successful} {SKIPPED_ICON}{skipped} {FAILED_ICON}{failed} | "
+            f"{TIME_ICON} {remaining_time/60:.1f}m left")
+    # Add a newline if complete
+    if completed >= total:
+        line += "\n"
+    
+    with progress_lock:
+        sys.stdout.write(line)
+        sys.stdout.flush()
 
 def ensure_sra_toolkit():
     """Checks if SRA toolkit is installed, and tries to install it if not."""
@@ -1263,18 +1826,20 @@ def ensure_sra_toolkit():
     
     try:
         # Check if prefetch is available
-        subprocess.run(["which", "prefetch"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if not has_tool("prefetch"):
+            raise FileNotFoundError("prefetch not found on PATH")
         local_log("info", "SRA toolkit is already installed")
         return True
-    except subprocess.CalledProcessError:
+    except FileNotFoundError:
         local_log("warning", "SRA toolkit not found, attempting to install...")
         
         # Try using conda if available
         try:
-            subprocess.run(["which", "conda"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if not has_tool("conda"):
+                raise FileNotFoundError("conda not found on PATH")
             local_log("info", "Conda found, installing SRA toolkit with conda...")
             
-            install_cmd = ["conda", "install", "-c", "bioconda", "-y", "sra-tools"]
+            install_cmd = [resolve_tool("conda"), "install", "-c", "bioconda", "-y", "sra-tools"]
             process = subprocess.run(
                 install_cmd,
                 stdout=subprocess.PIPE,
@@ -1285,22 +1850,24 @@ def ensure_sra_toolkit():
             
             if process.returncode == 0:
                 local_log("info", "Successfully installed SRA toolkit with conda")
+                forget_tool_lookups()
                 return True
             else:
                 local_log("warning", f"Failed to install SRA toolkit with conda: {process.stdout}")
-        except subprocess.CalledProcessError:
+        except FileNotFoundError:
             local_log("warning", "Conda not available")
         
         # Try apt-get if on a Debian/Ubuntu system
         try:
-            subprocess.run(["which", "apt-get"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            if not has_tool("apt-get"):
+                raise FileNotFoundError("apt-get not found on PATH")
             local_log("info", "apt-get found, trying to install SRA toolkit...")
             
             local_log("info", "This may require sudo privileges. Please enter your password if prompted.")
-            install_cmd = ["sudo", "apt-get", "update"]
+            install_cmd = [resolve_tool("sudo"), "apt-get", "update"]
             subprocess.run(install_cmd, check=False)
             
-            install_cmd = ["sudo", "apt-get", "install", "-y", "sra-toolkit"]
+            install_cmd = [resolve_tool("sudo"), "apt-get", "install", "-y", "sra-toolkit"]
             process = subprocess.run(
                 install_cmd,
                 stdout=subprocess.PIPE,
@@ -1311,16 +1878,47 @@ def ensure_sra_toolkit():
             
             if process.returncode == 0:
                 local_log("info", "Successfully installed SRA toolkit with apt-get")
+                forget_tool_lookups()
                 return True
             else:
                 local_log("warning", f"Failed to install SRA toolkit with apt-get: {process.stdout}")
-        except subprocess.CalledProcessError:
+        except FileNotFoundError:
             local_log("warning", "apt-get not available")
         
         local_log("error", "Could not install SRA toolkit automatically. Please install it manually.")
         local_log("info", "Instructions: https://github.com/ncbi/sra-tools/wiki/02.-Installing-SRA-Toolkit")
         return False
 
+def probe_mirror(name, url):
+    """HEAD one repository endpoint and record the result in MIRROR_STATE, returning (reachable, report lines)."""
+    start_time = time.monotonic()
+    try:
+        # HEAD over the shared keep-alive pool, so the TLS session is already up when downloads start;
+        # redirects are not followed, since answering with one already shows the server is up
+        response = HTTP_POOL.request("HEAD", url, max_redirects=0, timeout=10)
+        response.read()
+        HTTP_POOL.release(response)
+        reachable = True
+        
+        # Check for successful response (including redirects)
+        success = response.status < 400
+        
+        if success:
+            report = [f"[INFO] ✅ Connection to {name} ({url}) successful"]
+        else:
+            report = [f"[WARNING] ⚠️ Connection to {name} ({url}) failed or returned unexpected status",
+                      f"[DEBUG] Response status: HTTP {response.status} {response.reason}"]
+            
+    except Exception as e:
+        report = [f"[ERROR] ❌ Error checking connection to {name} ({url}): {e}"]
+        success = False
+        reachable = False
+    
+    with mirror_state_lock:
+        MIRROR_STATE[name] = {"ok": success, "reachable": reachable, "rtt": time.monotonic() - start_time,
+                              "t": time.monotonic()}
+    return success, report
+
 def check_network_connectivity():
     """
     Check network connectivity to EBI and NCBI servers.
@@ -1338,45 +1936,29 @@ def check_network_connectivity():
     
     results = {}
     
+    # Reuse recent results rather than probing the same endpoints again
+    to_probe = {}
     for name, url in urls_to_check.items():
-        try:
-            # Use curl with a 10-second timeout, only getting headers
-            cmd = ["curl", "-I", "-s", "--connect-timeout", "10", url]
-            process = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=False
-            )
-            
-            # Check for successful response (including redirects and HTTP/2)
-            success = False
-            if process.returncode == 0:
-                status_line = process.stdout.splitlines()[0] if process.stdout and process.stdout.splitlines() else ""
-                
-                # Check for HTTP 1.1 statuses
-                if any(status in process.stdout for status in [
-                    "200 OK", "301 Moved", "302 Found", "303 See Other", 
-                    "307 Temporary Redirect", "308 Permanent Redirect"
-                ]):
-                    success = True
-                
-                # Check for HTTP/2 success
-                elif "HTTP/2" in status_line and "200" in status_line:
-                    success = True
-            
-            if success:
-                print(f"[INFO] ✅ Connection to {name} ({url}) successful")
-                results[name] = True
-            else:
-                print(f"[WARNING] ⚠️ Connection to {name} ({url}) failed or returned unexpected status")
-                print(f"[DEBUG] Response status: {process.stdout.splitlines()[0] if process.stdout and process.stdout.splitlines() else 'No response'}")
-                results[name] = False
-                
-        except Exception as e:
-            print(f"[ERROR] ❌ Error checking connection to {name} ({url}): {e}")
-            results[name] = False
+        with mirror_state_lock:
+            state = MIRROR_STATE.get(name)
+        if state and time.monotonic() - state["t"] < MIRROR_STATE_TTL:
+            results[name] = state["ok"]
+        else:
+            to_probe[name] = url
+    
+    # Probe every endpoint at once, so a dead mirror costs one timeout in total rather than one each
+    reports = {}
+    if to_probe:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(to_probe)) as executor:
+            future_to_name = {executor.submit(probe_mirror, name, url): name for name, url in to_probe.items()}
+            for future in concurrent.futures.as_completed(future_to_name):
+                name = future_to_name[future]
+                results[name], reports[name] = future.result()
+    
+    # Report once every probe is back, in a fixed order rather than interleaved as they finish
+    for name in to_probe:
+        print("\n".join(reports[name]))
+    results = {name: results[name] for name in urls_to_check}
     
     # Check if any server is reachable
     if not any(results.values()):
@@ -1394,6 +1976,7 @@ def check_network_connectivity():
 def main():
     """Main entry point for the script."""
     args = parse_args()
+    init_runtime(args)
     
     # Try to install SRA toolkit if not found
     sra_installed = ensure_sra_toolkit()
@@ -1414,18 +1997,8 @@ def main():
         print("\n[INFO] Test completed. Fix any issues before running the actual download.")
         return
     
-    # Create missing paths if appropriate
-    workspace_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
-    
     # Convert relative paths to absolute if they're relative to workspace
-    if not os.path.isabs(args.id_list):
-        args.id_list = os.path.join(workspace_root, args.id_list)
-    
-    if not os.path.isabs(args.out_dir):
-        args.out_dir = os.path.join(workspace_root, args.out_dir)
-    
-    if not os.path.isabs(args.metadata):
-        args.metadata = os.path.join(workspace_root, args.metadata)
+    args.id_list, args.out_dir, args.metadata = map(abs_path, (args.id_list, args.out_dir, args.metadata))
     
     # Validate inputs
     if not os.path.exists(args.id_list):
@@ -1440,37 +2013,55 @@ def main():
     os.makedirs(args.out_dir, exist_ok=True)
     fix_directory_permissions(args.out_dir)
     
-    # Read SRR IDs
+    # Read SRR IDs, keeping only well-formed run accessions and dropping repeats
+    # (one read and a C-level whitespace split, rather than stripping line by line)
     with open(args.id_list, 'r') as f:
-        srr_ids = [line.strip() for line in f if line.strip()]
+        id_lines = f.read().split()
+    accepted = []
+    rejected = []
+    for line in id_lines:
+        (accepted if SRR_ID_RE.match(line) else rejected).append(line)
+    srr_ids = list(dict.fromkeys(accepted))
+    if rejected:
+        safe_log("warning", f"Ignoring {len(rejected)} malformed line(s) in {args.id_list}: {', '.join(rejected[:5])}"
+                 f"{', ...' if len(rejected) > 5 else ''}")
+    if len(srr_ids) < len(id_lines) - len(rejected):
+        safe_log("warning", f"Ignoring {len(id_lines) - len(rejected) - len(srr_ids)} duplicate SRR ID(s) in {args.id_list}")
     
     total_ids = len(srr_ids)
     
     # Display startup message
-    print("\n" + "=" * terminal_width)
+    print("\n" + separator)
     print(f"🧬 Smart SRA Downloader for Amalgkit")
     print(f"📊 Starting download of {total_ids} SRA entries with up to {args.max_concurrent} concurrent downloads")
-    print("=" * terminal_width)
+    print(separator)
     
     safe_log("info", f"Starting smart download of {total_ids} SRA entries with up to {args.max_concurrent} concurrent downloads")
     
     # Debug metadata column mapping
     try:
-        metadata = pd.read_csv(args.metadata, sep='\t')
-        metadata_columns = list(metadata.columns)
+        with open(args.metadata, 'r', newline='') as f:
+            metadata_columns = next(csv.reader(f, delimiter='\t'), [])
         # Only print the first 5 columns and "..." if there are more
         columns_to_show = metadata_columns[:5]
         columns_str = ", ".join(columns_to_show)
         if len(metadata_columns) > 5:
             columns_str += ", ..."
         safe_log("info", f"Metadata columns available: {columns_str}")
-        if 'run' in metadata.columns:
+        if get_metadata_columns(metadata_columns)[0] == 'run':
             safe_log("info", f"Using 'run' column instead of 'run_accession'")
     except Exception as e:
         safe_log("warning", f"Could not read metadata for debugging: {e}")
     
+    # Parse the layout of every run once instead of re-reading the metadata per SRR
+    layout_map = load_layout_map(args.metadata)
+    
     # Start timing
-    start_time_total = time.time()
+    # (monotonic, so clock adjustments during a long run cannot skew the ETA)
+    start_ns = time.monotonic_ns()
+    
+    # One listing of out_dir tells which runs can have existing files at all, so the rest skip the check
+    existing_dirs = frozenset(name for name, entry in scan_directory(args.out_dir).items() if entry.is_dir())
     
     # Results counters
     successful = 0
@@ -1478,93 +2069,133 @@ def main():
     failed = 0
     completed = 0
     
-    # Use ThreadPoolExecutor for parallel downloads
-    with concurrent.futures.ThreadPoolExecutor(max_workers=args.max_concurrent) as executor:
-        # Submit all tasks
-        future_to_srr = {
-            executor.submit(
-                download_worker, 
-                srr_id, 
-                args.out_dir, 
-                args.threads, 
-                args.amalgkit_path, 
-                args.metadata,
-                args.force
-            ): srr_id for srr_id in srr_ids
-        }
+    # Use ThreadPoolExecutor for parallel downloads; workers mostly sit in curl/SRA toolkit
+    # subprocesses with the GIL released, so there is never a reason to start more than there are SRRs
+    # (threads are only started as work is submitted, so sizing before the bulk pass costs nothing)
+    num_workers = max(1, min(args.max_concurrent, len(srr_ids)))
+    interrupted = False
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+        window = num_workers * 2
+        future_to_srr = {}
         
-        # Initial empty progress bar
-        display_emoji_progress_bar(0, total_ids, 0, 0, 0, 0)
+        def submit_more():
+            """Top the in-flight window back up from the remaining SRR IDs."""
+            for srr_id in pending_ids:
+                future = executor.submit(
+                    download_worker, 
+                    srr_id, 
+                    args.out_dir, 
+                    args.threads, 
+                    args.amalgkit_path, 
+                    args.metadata,
+                    layout_map,
+                    args.force,
+                    existing_dirs
+                )
+                future_to_srr[future] = srr_id
+                if len(future_to_srr) >= window:
+                    break
         
-        # Process results as they complete
-        for future in concurrent.futures.as_completed(future_to_srr):
-            srr_id = future_to_srr[future]
-            try:
-                srr_id, result = future.result()
-                completed += 1
-                
-                if result == "success":
-                    successful += 1
-                elif result == "skipped":
-                    skipped += 1
-                else:
-                    failed += 1
-                
-                # Show progress
-                elapsed_time = time.time() - start_time_total
-                display_emoji_progress_bar(completed, total_ids, successful, skipped, failed, elapsed_time)
-                
-                # Also log this in the log file
-                progress_pct = (completed / total_ids) * 100
-                estimated_total = (elapsed_time / completed) * total_ids if completed > 0 else 0
-                remaining_time = estimated_total - elapsed_time if estimated_total > 0 else 0
-                
-                safe_log("info", f"Progress: {progress_pct:.1f}% ({completed}/{total_ids}) - "
-                        f"Est. remaining: {remaining_time/60:.1f} min - "
-                        f"Success: {successful}, Skipped: {skipped}, Failed: {failed}")
-                
-            except Exception as e:
-                safe_log("error", f"Error processing {srr_id}: {e}")
-                failed += 1
-                completed += 1
+        # Ctrl-C is handled from the bulk pass onwards, so an interrupt at any point stops the run cleanly
+        try:
+            # Fetch every SRR from its primary EBI location in one curl process first;
+            # only what that pass could not deliver goes through the per-SRR fallback chain
+            bulk_downloaded = bulk_download_from_ebi(srr_ids, args.out_dir, layout_map, args.force, existing_dirs)
+            successful = completed = len(bulk_downloaded)
+            # Group runs by archive prefix (SRR/ERR/DRR: NCBI, ENA or DDBJ submissions, which the mirrors
+            # serve from different places), keeping list order within each group, so consecutive workers
+            # tend to hit the same hosts and directories while their pooled connections are still warm
+            worker_ids = sorted((srr_id for srr_id in srr_ids if srr_id not in bulk_downloaded), key=lambda srr_id: srr_id[:3])
+            
+            # Keep only a window of SRRs submitted at a time, so futures stay O(window) rather than O(N)
+            pending_ids = iter(worker_ids)
+            submit_more()
+            last_progress_log = 0.0
+            
+            # Initial progress bar, counting anything the bulk pass already delivered
+            display_emoji_progress_bar(completed, total_ids, successful, 0, 0, (time.monotonic_ns() - start_ns) / 1e9)
+            
+            # Process results as they complete, waking at least once a second to keep the ETA moving
+            # and so that Ctrl-C is handled promptly
+            while future_to_srr:
+                done, _ = concurrent.futures.wait(future_to_srr, timeout=1.0,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                if not done:
+                    elapsed_time = (time.monotonic_ns() - start_ns) / 1e9
+                    display_emoji_progress_bar(completed, total_ids, successful, skipped, failed, elapsed_time)
+                    continue
+                for future in done:
+                    srr_id = future_to_srr.pop(future)
+                    try:
+                        srr_id, result = future.result()
+                        completed += 1
+                        
+                        if result == "success":
+                            successful += 1
+                        elif result == "skipped":
+                            skipped += 1
+                        else:
+                            failed += 1
+                        
+                        # Show progress
+                        elapsed_time = (time.monotonic_ns() - start_ns) / 1e9
+                        display_emoji_progress_bar(completed, total_ids, successful, skipped, failed, elapsed_time)
+                        
+                        # Also log this in the log file, behind the same 10 Hz gate as the bar
+                        now = time.monotonic()
+                        if now - last_progress_log >= PROGRESS_REDRAW_INTERVAL or completed == total_ids:
+                            last_progress_log = now
+                            progress_pct = (completed / total_ids) * 100
+                            estimated_total = (elapsed_time / completed) * total_ids if completed > 0 else 0
+                            remaining_time = estimated_total - elapsed_time if estimated_total > 0 else 0
+                        
+                            safe_log("info", f"Progress: {progress_pct:.1f}% ({completed}/{total_ids}) - "
+                                    f"Est. remaining: {remaining_time/60:.1f} min - "
+                                    f"Success: {successful}, Skipped: {skipped}, Failed: {failed}")
+                        
+                    except Exception as e:
+                        safe_log("error", f"Error processing {srr_id}: {e}")
+                        failed += 1
+                        completed += 1
+                        
+                        # Update progress bar after error
+                        elapsed_time = (time.monotonic_ns() - start_ns) / 1e9
+                        display_emoji_progress_bar(completed, total_ids, successful, skipped, failed, elapsed_time)
                 
-                # Update progress bar after error
-                elapsed_time = time.time() - start_time_total
-                display_emoji_progress_bar(completed, total_ids, successful, skipped, failed, elapsed_time)
+                submit_more()
+        except KeyboardInterrupt:
+            interrupted = True
+            shutdown_event.set()
+            safe_log("warning", "Interrupted; stopping running downloads (partial files are kept for resuming)")
+            executor.shutdown(wait=False, cancel_futures=True)
     
     # Final summary
-    total_time = time.time() - start_time_total
+    total_time = (time.monotonic_ns() - start_ns) / 1e9
+    
+    # Render the summary once and send the same text to stdout, the log and the summary file
+    summary = SUMMARY_TEMPLATE.format(total=total_ids, successful=successful, skipped=skipped,
+                                      failed=failed, minutes=total_time / 60)
     
     # Print beautiful summary
-    print("\n" + "=" * terminal_width)
-    print(f"📊 Download Summary:")
-    print(f"🔢 Total SRA entries: {total_ids}")
-    print(f"✅ Successfully downloaded: {successful}")
-    print(f"⏭️  Skipped (already exists): {skipped}")
-    print(f"❌ Failed: {failed}")
-    print(f"⏱️  Total time: {total_time/60:.1f} minutes")
-    print("=" * terminal_width + "\n")
-    
-    safe_log("info", "=" * 60)
-    safe_log("info", f"Download Summary:")
-    safe_log("info", f"  Total SRA entries: {total_ids}")
-    safe_log("info", f"  Successfully downloaded: {successful}")
-    safe_log("info", f"  Skipped (already exists): {skipped}")
-    safe_log("info", f"  Failed: {failed}")
-    safe_log("info", f"  Total time: {total_time/60:.1f} minutes")
-    safe_log("info", "=" * 60)
+    print(f"\n{separator}\n📊 Download Summary:\n{summary}{separator}\n")
+    
+    safe_log("info", f"Download Summary:\n{LOG_SEPARATOR}\n{summary}{LOG_SEPARATOR}")
     
     # Create a marker file to indicate successful completion
     summary_file = os.path.join(args.out_dir, "download_summary.txt")
-    with open(summary_file, 'w') as f:
-        f.write(f"Download completed on {datetime.now().isoformat()}\n")
-        f.write(f"Total SRA entries: {total_ids}\n")
-        f.write(f"Successfully downloaded: {successful}\n")
-        f.write(f"Skipped (already exists): {skipped}\n")
-        f.write(f"Failed: {failed}\n")
-        f.write(f"Total time: {total_time/60:.1f} minutes\n")
+    summary = f"Download completed on {datetime.now().isoformat()}\n{summary}"
+    # One write into a temporary file, renamed into place, so an interrupt never leaves half a summary
+    temp_summary_file = f"{summary_file}.{os.getpid()}.tmp"
+    summary_fd = os.open(temp_summary_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(summary_fd, summary.encode())
+    finally:
+        os.close(summary_fd)
+    os.replace(temp_summary_file, summary_file)
     
     # Return appropriate exit code
+    if interrupted:
+        sys.exit(130)
     if failed > 0:
         sys.exit(1)
     sys.exit(0)